@@ -3,7 +3,7 @@ FastAPI main application
 """
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form, Header, Cookie
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, Response, FileResponse
+from fastapi.responses import HTMLResponse, Response, FileResponse, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
@@ -15,15 +15,23 @@ from core.database.manager import PDFDatabaseManager
 from modules.doubt_solver.services.response_generator import ResponseGenerator
 from modules.pdf_processor.services.pdf_processor import PDFProcessor
 from modules.pdf_processor.models.pdf_models import ProcessingResponse, PDFDocument
-from core.simple_auth import SimpleAuth
+from core.simple_auth import get_auth
 from modules.agents.retrieval_agent import RetrievalAgent
 from modules.agents.tutor_agent import AITutorAgent
 
+try:
+    import orjson  # noqa: F401 - only needed by ORJSONResponse at render time
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 app = FastAPI(
     title="AI Tutor Backend",
     description="AI-powered teaching assistant with doubt solving capabilities",
-    version="1.0.0"
+    version="1.0.0",
+    # orjson serialises the JSON payloads several times faster than the stdlib encoder
+    default_response_class=ORJSONResponse if ORJSON_AVAILABLE else JSONResponse
 )
 
 # Enable CORS for frontend
@@ -40,7 +48,7 @@ db_config = None
 db_manager = None
 response_generator = None
 pdf_processor = None
-auth_system = SimpleAuth()
+auth_system = get_auth()
 tutor_agent = None
 retrieval_agent = None
 
@@ -222,12 +230,19 @@ async def startup_event():
     except Exception as e:
         print(f"\n❌ Failed to initialize app: {str(e)}\n")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared connections on shutdown"""
+    await auth_system.sessions.close()
+
 def _initialize_models_thread():
     """Initialize models in the background after server starts (non-async version)"""
     global pdf_processor
     try:
         print("\n🔄 Initializing PDF processor (downloading models in background)...")
         pdf_processor = PDFProcessor()
+        # Embedding model is loaded lazily; warm it up here so the first upload doesn't pay for it
+        pdf_processor.is_embedding_available()
         print("✅ PDF processor initialized")
         print("\n✅ All components initialized successfully!\n")
     except Exception as e:
@@ -446,19 +461,16 @@ async def upload_pdf(
         
         logger.info("✅ File validation passed")
         
-        # Read file content
-        logger.info("📖 Reading file content...")
-        file_content = await file.read()
-        logger.info(f"✅ Read {len(file_content)} bytes from file")
-        
-        # Process the PDF with user context
+        # Process the PDF with user context, streaming from the upload's spooled temp file
+        # instead of reading the whole file into memory
         logger.info("🔄 Starting PDF processing pipeline...")
         result = await pdf_proc.process_pdf(
-            file_content=file_content,
+            file_content=file.file,
             original_filename=file.filename,
             subject=subject,
             description=description,
-            user_id=current_user["user_id"]  # Pass user ID for user-specific storage
+            user_id=current_user["user_id"],  # Pass user ID for user-specific storage
+            file_size=file.size
         )
         
         logger.info(f"✅ PDF processing completed: {result.success}")
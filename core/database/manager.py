@@ -1,9 +1,19 @@
 """
 Database manager for PDF storage and retrieval operations
 """
-from typing import List, Dict, Any, Optional
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Optional, Set
 from .config import DatabaseConfig
 
+# A 'processing' row this old belongs to a worker that crashed or restarted mid-pipeline
+PROCESSING_STALE_AFTER = timedelta(minutes=30)
+
+
+def _utc_timestamp(moment: datetime) -> str:
+    """Format a UTC timestamp for PostgREST filters (no '+' offset to URL-escape)."""
+    return moment.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
 class PDFDatabaseManager:
     """Manager class for PDF storage and retrieval operations"""
     
@@ -29,7 +39,10 @@ class PDFDatabaseManager:
     async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
         """Get user by ID"""
         try:
-            result = self.client.table("users").select("*").eq("id", user_id).execute()
+            # Never select password_hash: this row is returned straight to API clients
+            result = self.client.table("users").select(
+                "id, name, email, role, created_at, updated_at"
+            ).eq("id", user_id).execute()
             return result.data[0] if result.data else None
         except Exception as e:
             print(f"Error getting user: {e}")
@@ -80,7 +93,9 @@ class PDFDatabaseManager:
         file_size: int,
         total_pages: int = None,
         metadata: Dict[str, Any] = None,
-        user_id: Optional[str] = None
+        user_id: Optional[str] = None,
+        content_sha256: Optional[str] = None,
+        processing_status: Optional[str] = None
     ) -> Dict[str, Any]:
         """Create a new PDF document record"""
         try:
@@ -98,11 +113,116 @@ class PDFDatabaseManager:
             if user_id:
                 pdf_data["user_id"] = user_id
             
+            if content_sha256:
+                pdf_data["content_sha256"] = content_sha256
+            
+            if processing_status:
+                pdf_data["processing_status"] = processing_status
+                if processing_status == "processing":
+                    pdf_data["processing_started_at"] = _utc_timestamp(datetime.now(timezone.utc))
+            
             result = self.service_client.table("pdf_documents").insert(pdf_data).execute()
             return {"success": True, "data": result.data[0]}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    async def claim_pdf_for_retry(
+        self,
+        pdf_id: str,
+        filename: str,
+        original_filename: str,
+        subject_id: str,
+        file_size: int,
+        metadata: Dict[str, Any] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Reset a failed, pending or stale PDF record for a new processing attempt.
+        
+        The status filter makes the claim atomic: only one upload can move the row to
+        'processing', and rows being processed by a live worker are left untouched. A
+        'processing' row started more than PROCESSING_STALE_AFTER ago (or before the
+        timestamp existed) is treated as abandoned.
+        
+        Returns:
+            The claimed row, or None if the row was not claimable (or the update failed)
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            result = self.service_client.table("pdf_documents").update({
+                "filename": filename,
+                "original_filename": original_filename,
+                "subject_id": subject_id,
+                "file_size": file_size,
+                "metadata": metadata or {},
+                "processing_status": "processing",
+                "processed": False,
+                "processing_error": None,
+                "chunk_count": 0,
+                "processing_started_at": _utc_timestamp(now)
+            }).eq("id", pdf_id).or_(self._claimable_filter(now)).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error claiming PDF for retry: {e}")
+            return None
+    
+    async def claim_pdf_for_resume(self, pdf_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Move a failed, pending or stale PDF record back to 'processing', keeping its chunks.
+        
+        Same atomic status filter as claim_pdf_for_retry, so two resumes (or a resume and a
+        retry) of one document cannot run at the same time.
+        
+        Returns:
+            The claimed row, or None if the row was not claimable (or the update failed)
+        """
+        try:
+            now = datetime.now(timezone.utc)
+            result = self.service_client.table("pdf_documents").update({
+                "processing_status": "processing",
+                "processed": False,
+                "processing_error": None,
+                "processing_started_at": _utc_timestamp(now)
+            }).eq("id", pdf_id).or_(self._claimable_filter(now)).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error claiming PDF for resume: {e}")
+            return None
+    
+    @staticmethod
+    def _claimable_filter(now: datetime) -> str:
+        """PostgREST or-filter matching failed, pending and stale 'processing' rows"""
+        cutoff = _utc_timestamp(now - PROCESSING_STALE_AFTER)
+        return (
+            "processing_status.in.(failed,pending),"
+            f"and(processing_status.eq.processing,processing_started_at.lt.{cutoff}),"
+            "and(processing_status.eq.processing,processing_started_at.is.null)"
+        )
+    
+    @staticmethod
+    def is_pdf_claimable(pdf_row: Dict[str, Any]) -> bool:
+        """Whether claim_pdf_for_retry would accept this row (failed, pending or stale)"""
+        status = pdf_row.get("processing_status")
+        if status in ("failed", "pending"):
+            return True
+        if status != "processing":
+            return False
+        started_at = pdf_row.get("processing_started_at")
+        if not started_at:
+            return True
+        started = datetime.fromisoformat(started_at.replace("Z", "+00:00"))
+        return datetime.now(timezone.utc) - started > PROCESSING_STALE_AFTER
+    
+    async def get_pdf_by_hash(self, user_id: str, content_sha256: str) -> Optional[Dict[str, Any]]:
+        """Get a user's PDF document by the SHA-256 of its content"""
+        try:
+            result = self.service_client.table("pdf_documents").select(
+                "id, processing_status, processing_started_at, chunk_count"
+            ).eq("user_id", user_id).eq("content_sha256", content_sha256).execute()
+            return result.data[0] if result.data else None
+        except Exception as e:
+            print(f"Error getting PDF by hash: {e}")
+            return None
+    
     async def get_pdf_documents(self, subject_id: str) -> List[Dict[str, Any]]:
         """Get all PDF documents for a subject"""
         try:
@@ -117,21 +237,35 @@ class PDFDatabaseManager:
         pdf_id: str, 
         status: str, 
         chunk_count: int = None,
-        error_message: str = None
+        error_message: str = None,
+        reusable: bool = True
     ) -> bool:
-        """Update PDF processing status"""
+        """
+        Update PDF processing status
+        
+        Args:
+            reusable: False drops the content hash so duplicate uploads re-process the
+                file instead of reusing this document (e.g. placeholder extractions)
+        """
         try:
             update_data = {
                 "processing_status": status,
                 "processed": status == "completed"
             }
             
+            if status == "processing":
+                # Refresh the claim so the row isn't mistaken for an abandoned one
+                update_data["processing_started_at"] = _utc_timestamp(datetime.now(timezone.utc))
+            
             if chunk_count is not None:
                 update_data["chunk_count"] = chunk_count
             
             if error_message:
                 update_data["processing_error"] = error_message
             
+            if not reusable:
+                update_data["content_sha256"] = None
+            
             # Use service client to bypass RLS for status updates
             result = self.service_client.table("pdf_documents").update(update_data).eq("id", pdf_id).execute()
             return True
@@ -208,7 +342,8 @@ class PDFDatabaseManager:
                     'total_chunks': doc.get('chunk_count', 0),
                     'processing_error': doc.get('processing_error'),
                     'metadata': doc.get('metadata', {}),
-                    'user_id': doc.get('user_id')
+                    'user_id': doc.get('user_id'),
+                    'content_sha256': doc.get('content_sha256')
                 }
             return None
         except Exception as e:
@@ -266,11 +401,38 @@ class PDFDatabaseManager:
     async def batch_create_chunks(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Create multiple document chunks in batch"""
         try:
-            result = self.service_client.table("document_chunks").insert(chunks).execute()
+            # The Supabase client is synchronous; run the request on a worker thread so
+            # concurrent batches overlap and the event loop stays free
+            query = self.service_client.table("document_chunks").insert(chunks)
+            result = await asyncio.to_thread(query.execute)
             return {"success": True, "data": result.data, "count": len(result.data)}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    async def list_chunks_by_pdf(self, pdf_id: str, embedded_only: bool = False) -> List[Dict[str, Any]]:
+        """List stored chunk indexes for a PDF, optionally only chunks that have embeddings"""
+        try:
+            query = self.service_client.table("document_chunks").select("id, chunk_index").eq("pdf_id", pdf_id)
+            if embedded_only:
+                query = query.not_.is_("embedding", "null")
+            result = query.order("chunk_index").execute()
+            return result.data if result.data else []
+        except Exception as e:
+            print(f"Error listing chunks for PDF: {e}")
+            return []
+    
+    async def delete_pdf_chunks(self, pdf_id: str, exclude_indexes: Optional[Set[int]] = None) -> bool:
+        """Delete chunks of a PDF, keeping those whose chunk_index is in exclude_indexes"""
+        try:
+            query = self.service_client.table("document_chunks").delete().eq("pdf_id", pdf_id)
+            if exclude_indexes:
+                query = query.not_.in_("chunk_index", sorted(exclude_indexes))
+            query.execute()
+            return True
+        except Exception as e:
+            print(f"Error deleting chunks for PDF: {e}")
+            return False
+    
     async def update_chunk_embedding(self, chunk_id: str, embedding: List[float]) -> bool:
         """Update embedding for a specific chunk"""
         try:
@@ -0,0 +1,15 @@
+-- Migration: Add content hash to pdf_documents for duplicate upload detection
+-- Re-uploading an identical PDF reuses the existing document instead of re-processing it
+
+-- When the current processing attempt claimed the row; 'processing' rows that are too
+-- old belong to a crashed worker and may be claimed by a retry
+ALTER TABLE pdf_documents
+ADD COLUMN IF NOT EXISTS processing_started_at TIMESTAMP WITH TIME ZONE;
+
+-- Add SHA-256 hex digest of the uploaded file content
+ALTER TABLE pdf_documents
+ADD COLUMN IF NOT EXISTS content_sha256 VARCHAR(64);
+
+-- One document per (user, content); NULL hashes (legacy rows) are not constrained
+CREATE UNIQUE INDEX IF NOT EXISTS idx_pdf_documents_user_content_sha256
+ON pdf_documents(user_id, content_sha256);
@@ -55,9 +55,11 @@ CREATE TABLE pdf_documents (
     processed BOOLEAN DEFAULT FALSE,
     processing_status VARCHAR(50) DEFAULT 'pending', -- 'pending', 'processing', 'completed', 'failed'
     processing_error TEXT, -- Store error details if processing fails
+    processing_started_at TIMESTAMP WITH TIME ZONE, -- When the current processing attempt claimed the row
     metadata JSONB, -- Additional PDF metadata (author, creation date, etc.)
     chunk_count INTEGER DEFAULT 0, -- Track how many chunks were created
-    total_chunks INTEGER DEFAULT 0 -- Alias for consistency
+    total_chunks INTEGER DEFAULT 0, -- Alias for consistency
+    content_sha256 VARCHAR(64) -- SHA-256 of the uploaded file, used to skip duplicate uploads
 );
 
 -- Document Chunks with Vector Embeddings (Core for LLM retrieval)
@@ -113,6 +115,7 @@ WITH (lists = 100);
 CREATE INDEX idx_pdf_documents_subject_id ON pdf_documents(subject_id);
 CREATE INDEX idx_pdf_documents_user_id ON pdf_documents(user_id); -- Added for user isolation performance
 CREATE INDEX idx_pdf_documents_processed ON pdf_documents(processed, processing_status);
+CREATE UNIQUE INDEX idx_pdf_documents_user_content_sha256 ON pdf_documents(user_id, content_sha256); -- Duplicate upload detection
 CREATE INDEX idx_document_chunks_pdf_id ON document_chunks(pdf_id);
 CREATE INDEX idx_document_chunks_page ON document_chunks(page_number);
 CREATE INDEX idx_subjects_user_id ON subjects(user_id);
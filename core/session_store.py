@@ -0,0 +1,109 @@
+"""
+Session Store for AI Tutor
+==========================
+Keeps login sessions where every server worker can see them.
+
+Uses Redis when REDIS_URL is set and the redis package is installed, so sessions
+survive across uvicorn workers and hosts. Otherwise falls back to a per-process
+in-memory store (fine for a single worker / local development).
+"""
+
+import functools
+import json
+import os
+import time
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Sessions expire after this many seconds without being used
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", "3600"))
+
+
+class InMemorySessionStore:
+    """Per-process session store with sliding expiry."""
+    
+    # Sweep expired sessions at most this often (seconds); get() already drops expired hits
+    PURGE_INTERVAL = 60.0
+    
+    def __init__(self, ttl: int = SESSION_TTL_SECONDS):
+        self.ttl = ttl
+        self._sessions: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+    
+    async def set(self, session_id: str, data: Dict[str, Any]):
+        """Store session data, replacing any existing entry."""
+        now = time.monotonic()
+        if now >= self._next_purge:
+            self._purge_expired(now)
+            self._next_purge = now + self.PURGE_INTERVAL
+        self._sessions[session_id] = (now + self.ttl, data)
+    
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return session data and extend its expiry, or None if missing or expired."""
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        expires_at, data = entry
+        now = time.monotonic()
+        if expires_at <= now:
+            del self._sessions[session_id]
+            return None
+        self._sessions[session_id] = (now + self.ttl, data)
+        return data
+    
+    async def delete(self, session_id: str):
+        """Remove a session if it exists."""
+        self._sessions.pop(session_id, None)
+    
+    async def close(self):
+        """Nothing to release for the in-memory store."""
+    
+    def _purge_expired(self, now: float):
+        """Drop expired sessions so abandoned logins don't accumulate."""
+        expired = [sid for sid, (expires_at, _) in self._sessions.items() if expires_at <= now]
+        for sid in expired:
+            del self._sessions[sid]
+
+
+class RedisSessionStore:
+    """Redis-backed session store shared by all workers, with sliding expiry."""
+    
+    def __init__(self, url: str, ttl: int = SESSION_TTL_SECONDS, prefix: str = "session:"):
+        self.ttl = ttl
+        self.prefix = prefix
+        # One connection pool per process, reused across requests
+        self.client = aioredis.from_url(url)
+    
+    async def set(self, session_id: str, data: Dict[str, Any]):
+        """Store session data, replacing any existing entry."""
+        await self.client.set(self.prefix + session_id, json.dumps(data), ex=self.ttl)
+    
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return session data and extend its expiry, or None if missing or expired."""
+        raw = await self.client.getex(self.prefix + session_id, ex=self.ttl)
+        return json.loads(raw) if raw else None
+    
+    async def delete(self, session_id: str):
+        """Remove a session if it exists."""
+        await self.client.delete(self.prefix + session_id)
+    
+    async def close(self):
+        """Close the Redis connection pool."""
+        await self.client.aclose()
+
+
+@functools.lru_cache(maxsize=1)
+def get_session_store():
+    """Get the process-wide session store (Redis if configured, else in-memory)."""
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url and REDIS_AVAILABLE:
+        print("✅ Using Redis session store")
+        return RedisSessionStore(redis_url)
+    if redis_url:
+        print("⚠️ REDIS_URL is set but the redis package is not installed; using in-memory sessions")
+    return InMemorySessionStore()
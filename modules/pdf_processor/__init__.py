@@ -8,6 +8,7 @@ Handles PDF upload, text extraction, chunking, embedding generation, and storage
 from .models import (
     PDFDocument,
     PDFChunk,
+    TextChunk,
     ProcessingStatus,
     ProcessingError,
     UploadRequest,
@@ -24,6 +25,7 @@ __all__ = [
     # Models
     "PDFDocument",
     "PDFChunk",
+    "TextChunk",
     "ProcessingStatus", 
     "ProcessingError",
     "UploadRequest",
@@ -7,6 +7,7 @@ Data models for PDF processing pipeline.
 from .pdf_models import (
     PDFDocument,
     PDFChunk,
+    TextChunk,
     ProcessingStatus,
     ProcessingError,
     UploadRequest,
@@ -16,6 +17,7 @@ from .pdf_models import (
 __all__ = [
     "PDFDocument",
     "PDFChunk", 
+    "TextChunk",
     "ProcessingStatus",
     "ProcessingError",
     "UploadRequest",
@@ -5,6 +5,7 @@ Defines the data structures for PDF processing pipeline.
 """
 
 from enum import Enum
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from pydantic import BaseModel, Field
@@ -46,6 +47,17 @@ class PDFChunk(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
+@dataclass(slots=True)
+class TextChunk:
+    """Lightweight record for a chunk of extracted text, before it is tied to a stored PDF."""
+    content: str
+    chunk_index: int
+    page_number: int
+    chunk_size: int
+    start_char: int
+    end_char: int
+
+
 class ProcessingError(BaseModel):
     """Model for processing errors."""
     error_type: str
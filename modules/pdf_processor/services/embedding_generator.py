@@ -6,11 +6,12 @@ Automatically reduces dimensions to 768 to match the Supabase pgvector column co
 """
 
 import logging
-from typing import List, Optional
+from typing import List, Optional, Tuple
 import os
 import numpy as np
 import torch
 from sentence_transformers import SentenceTransformer
+from ..models.pdf_models import TextChunk
 
 logger = logging.getLogger(__name__)
 
@@ -22,15 +23,29 @@ class EmbeddingGenerator:
     
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
-            cls._instance = super(EmbeddingGenerator, cls).__new__(cls, *args, **kwargs)
+            cls._instance = super(EmbeddingGenerator, cls).__new__(cls)
             cls._instance._initialized = False
         return cls._instance
         
-    def __init__(self):
+    def __init__(self, use_fp16: Optional[bool] = None):
+        """
+        Args:
+            use_fp16: Opt in to FP16 inference on GPU. None means no preference: FP32 when
+                creating the shared instance, and whatever it was created with afterwards.
+        """
         if self._initialized:
+            # Singleton: an explicit request that contradicts the loaded model is a bug
+            if use_fp16 is not None and use_fp16 != self.requested_fp16:
+                raise ValueError(
+                    f"EmbeddingGenerator already initialized with use_fp16={self.requested_fp16}, "
+                    f"cannot reconfigure to use_fp16={use_fp16}"
+                )
             return
         self.model_name = "BAAI/bge-m3"
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.requested_fp16 = bool(use_fp16)
+        # FP16 inference is only used on GPU; CPU stays in FP32
+        self.use_fp16 = self.requested_fp16 and self.device == "cuda"
         self.model = None
         self._initialize_model()
         self._initialized = True
@@ -42,6 +57,8 @@ class EmbeddingGenerator:
             
             # Load SentenceTransformer model
             self.model = SentenceTransformer(self.model_name, device=self.device)
+            if self.use_fp16:
+                self._enable_fp16()
             print("✅ BGE-M3 embeddings initialized successfully!")
             logger.info("BGE-M3 embeddings initialized successfully")
             
@@ -49,6 +66,7 @@ class EmbeddingGenerator:
             if "out of memory" in str(e).lower() and self.device == "cuda":
                 print("⚠️ CUDA out of memory. Falling back to CPU for Embeddings...")
                 self.device = "cpu"
+                self.use_fp16 = False
                 try:
                     self.model = SentenceTransformer(self.model_name, device="cpu")
                     print("✅ BGE-M3 embeddings initialized successfully on CPU!")
@@ -63,59 +81,89 @@ class EmbeddingGenerator:
                 logger.error(error_msg)
                 self.model = None
     
-    async def generate_embeddings(self, chunks: List[dict]) -> List[dict]:
+    def _enable_fp16(self, max_delta: float = 1e-3):
+        """Switch the model to FP16 weights, keeping FP32 if cosine similarity drifts too far."""
+        probe = [
+            "Photosynthesis converts light energy into chemical energy.",
+            "The derivative of sin(x) is cos(x).",
+        ]
+        reference = self.model.encode(probe, normalize_embeddings=True, show_progress_bar=False)
+        self.model.half()
+        with torch.autocast("cuda", dtype=torch.float16):
+            half = self.model.encode(probe, normalize_embeddings=True, show_progress_bar=False)
+        
+        cosine = np.sum(reference.astype(np.float32) * half.astype(np.float32), axis=1)
+        delta = float(np.max(np.abs(1.0 - cosine)))
+        if delta > max_delta:
+            logger.warning(f"FP16 embeddings drift from FP32 by {delta:.2e} (> {max_delta}); keeping FP32")
+            self.model.float()
+            self.use_fp16 = False
+        else:
+            logger.info(f"Using FP16 embeddings (cosine delta vs FP32: {delta:.2e})")
+    
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, running under CUDA autocast when FP16 is enabled."""
+        if self.use_fp16:
+            with torch.autocast("cuda", dtype=torch.float16):
+                embeddings = self.model.encode(
+                    texts,
+                    normalize_embeddings=True,
+                    show_progress_bar=False,
+                    device=self.device
+                )
+            return embeddings.astype(np.float32)
+        return self.model.encode(
+            texts,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            device=self.device
+        )
+    
+    async def generate_embeddings(self, chunks: List[TextChunk]) -> Tuple[List[TextChunk], Optional[np.ndarray]]:
         """
         Generate embeddings for a list of text chunks using BGE-M3.
         Reduces dimension from 1024 to 768 via Matryoshka slicing and L2 normalizes.
         
         Args:
-            chunks: List of chunk dictionaries with 'content' field
+            chunks: List of text chunks to embed
             
         Returns:
-            List of chunks with 'embedding' field added
+            Tuple of (chunks, embeddings) where embeddings is a contiguous float32
+            array of shape (len(chunks), 768) aligned with chunks, or None if
+            embeddings could not be generated
         """
         if not self.model:
             logger.warning("BGE-M3 model not available. Skipping embedding generation.")
-            for chunk in chunks:
-                chunk["embedding"] = None
-            return chunks
+            return chunks, None
+        
+        if not chunks:
+            return chunks, None
         
         try:
             total_chunks = len(chunks)
             print(f"⏳ Generating BGE-M3 embeddings for {total_chunks} chunks on {self.device}...")
             
-            texts = [chunk["content"] for chunk in chunks]
+            texts = [chunk.content for chunk in chunks]
             
             # SentenceTransformers encode is synchronous but fast on GPU.
             # Run on CPU/GPU depending on device detection.
-            embeddings = self.model.encode(
-                texts,
-                normalize_embeddings=True,
-                show_progress_bar=False,
-                device=self.device
-            )
+            embeddings = self._encode(texts)
             
             # Slice embeddings to 768 dimensions (Matryoshka representation)
-            embeddings_768 = embeddings[:, :768]
+            embeddings_768 = np.ascontiguousarray(embeddings[:, :768], dtype=np.float32)
             
             # Re-normalize sliced embeddings to make them valid unit vectors for cosine similarity
             norms = np.linalg.norm(embeddings_768, axis=1, keepdims=True)
-            norms = np.where(norms == 0, 1.0, norms)  # Avoid division by zero
-            embeddings_768 = embeddings_768 / norms
-            
-            # Add embeddings to chunks
-            for chunk, embedding in zip(chunks, embeddings_768):
-                chunk["embedding"] = embedding.tolist()
+            norms[norms == 0] = 1.0  # Avoid division by zero
+            embeddings_768 /= norms
             
             print(f"✅ Generated BGE-M3 embeddings for {total_chunks} chunks successfully!")
-            return chunks
+            return chunks, embeddings_768
             
         except Exception as e:
             logger.error(f"Embedding generation failed: {str(e)}")
             # Return chunks without embeddings
-            for chunk in chunks:
-                chunk["embedding"] = None
-            return chunks
+            return chunks, None
     
     async def generate_single_embedding(self, text: str) -> Optional[List[float]]:
         """Generate embedding for a single text (reduced to 768 dimensions and L2 normalized)."""
@@ -129,12 +177,7 @@ class EmbeddingGenerator:
                 cleaned_text = cleaned_text[:8000]
             
             # Encode single text
-            embedding = self.model.encode(
-                [cleaned_text],
-                normalize_embeddings=True,
-                show_progress_bar=False,
-                device=self.device
-            )[0]
+            embedding = self._encode([cleaned_text])[0]
             
             # Matryoshka slice to 768 dimensions
             emb_768 = embedding[:768]
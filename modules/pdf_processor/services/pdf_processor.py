@@ -4,11 +4,14 @@ PDF Processing Pipeline
 Main service that orchestrates the complete PDF processing workflow.
 """
 
+import asyncio
+import functools
 import logging
 import os
+import string
 import time
 import tempfile
-from typing import Optional, IO, Dict, Any
+from typing import Optional, IO, Dict, Any, List, Set, Union
 from datetime import datetime
 from ..models.pdf_models import (
     PDFDocument, PDFChunk, ProcessingStatus, 
@@ -16,150 +19,225 @@ from ..models.pdf_models import (
 )
 from .text_extractor import PDFTextExtractor
 from .embedding_generator import EmbeddingGenerator
+from ..utils.pdf_source import PDFSource, get_source_size, read_source_header, hash_source
+from ..utils.token_counter import count_tokens
+from core.database.config import DatabaseConfig
 from core.database.manager import PDFDatabaseManager
+from utils.performance_monitor import get_profiler
 
 logger = logging.getLogger(__name__)
 
+# Translation table that deletes every ASCII character not allowed in stored filenames
+_FILENAME_ALLOWED = set(string.ascii_letters + string.digits + " -_")
+_FILENAME_TRANS = str.maketrans("", "", "".join(chr(c) for c in range(128) if chr(c) not in _FILENAME_ALLOWED))
+
+# Extraction methods that store placeholder text instead of the PDF's content
+_PLACEHOLDER_EXTRACTION_METHODS = frozenset({"size_limit_exceeded", "emergency_fallback", "basic_fallback"})
+
+
+@functools.lru_cache(maxsize=2)
+def _get_embedder(use_fp16: bool = False) -> EmbeddingGenerator:
+    """
+    Get the shared embedding generator (loads the model on first use).
+    
+    The flag is part of the cache key, so a conflicting use_fp16 reaches the singleton
+    and raises instead of silently returning a model loaded with the other precision.
+    """
+    return EmbeddingGenerator(use_fp16=use_fp16)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_db_manager() -> PDFDatabaseManager:
+    """Get the shared database manager so Supabase clients are reused across processors."""
+    return PDFDatabaseManager(DatabaseConfig())
+
 
 class PDFProcessor:
     """Main PDF processing pipeline that coordinates all processing steps."""
     
-    def __init__(self):
-        from core.database.config import DatabaseConfig
+    def __init__(self, use_fp16: bool = False):
         self.text_extractor = PDFTextExtractor()
-        self.embedding_generator = EmbeddingGenerator()
-        db_config = DatabaseConfig()
-        self.db_manager = PDFDatabaseManager(db_config)
+        self.use_fp16 = use_fp16
+        self.db_manager = _get_db_manager()
+    
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        """Shared embedding generator, loaded lazily on first access."""
+        return _get_embedder(self.use_fp16)
     
     async def process_pdf(self, 
-                         file_content: bytes,
+                         file_content: Union[PDFSource, str, os.PathLike],
                          original_filename: str,
                          subject: Optional[str] = None,
                          description: Optional[str] = None,
                          metadata: Optional[Dict[str, Any]] = None,
-                         user_id: Optional[str] = None) -> ProcessingResponse:
+                         user_id: Optional[str] = None,
+                         file_size: Optional[int] = None,
+                         try_resume: bool = False,
+                         assume_owned: bool = False) -> ProcessingResponse:
         """
         Process a PDF file through the complete pipeline.
         
         Args:
-            file_content: Raw PDF file content as bytes
+            file_content: Raw PDF content as bytes/memoryview, a seekable binary file object,
+                or a path to a PDF file (streamed from disk rather than read into memory)
             original_filename: Original filename of the uploaded PDF
             subject: Subject category (optional)
             description: Description of the PDF content (optional)
             metadata: Additional metadata (optional)
             user_id: User ID for user-specific storage (required for new user-specific model)
+            file_size: Size of the content in bytes, if already known (optional)
+            try_resume: Resume the document in metadata["resume_pdf_id"], only embedding
+                and saving chunks that were not already stored with embeddings
+            assume_owned: The caller hands ownership of metadata over, so user_id is
+                added to it in place instead of to a copy
             
         Returns:
             ProcessingResponse with results and status
         """
-        from utils.performance_monitor import PDFProcessingProfiler
-        profiler = PDFProcessingProfiler()
+        if isinstance(file_content, (str, os.PathLike)):
+            with open(file_content, "rb") as pdf_file:
+                return await self.process_pdf(
+                    pdf_file, original_filename, subject=subject, description=description,
+                    metadata=metadata, user_id=user_id, file_size=file_size,
+                    try_resume=try_resume, assume_owned=assume_owned
+                )
+        
+        profiler = get_profiler()
         profiler.start_profiling()
         
         start_time = time.time()
         pdf_id = None
+        if file_size is None:
+            file_size = get_source_size(file_content)
         
         try:
             logger.info(f"📄 Starting PDF processing pipeline for: {original_filename}")
-            logger.info(f"📊 File size: {len(file_content)} bytes")
+            logger.info(f"📊 File size: {file_size} bytes")
             
-            # Validate file content and size
-            if not file_content or len(file_content) == 0:
-                logger.error("❌ Empty file content provided")
-                return ProcessingResponse(
-                    success=False,
-                    message="Empty file content provided",
-                    error=ProcessingError(
-                        error_type="VALIDATION_ERROR",
-                        error_message="Empty file content"
-                    )
-                )
-            
-            # Check file size limit (50MB)
-            max_file_size = 50 * 1024 * 1024  # 50MB
-            if len(file_content) > max_file_size:
-                logger.error(f"❌ File too large: {len(file_content)} bytes (max: {max_file_size})")
-                return ProcessingResponse(
-                    success=False,
-                    message=f"File too large. Maximum size is {max_file_size // 1024 // 1024}MB",
-                    error=ProcessingError(
-                        error_type="VALIDATION_ERROR",
-                        error_message=f"File size {len(file_content)} exceeds limit {max_file_size}"
-                    )
-                )
-            
-            # Basic PDF format validation
-            if not file_content.startswith(b'%PDF'):
-                logger.error("❌ Invalid PDF format")
-                return ProcessingResponse(
-                    success=False,
-                    message="Invalid PDF format",
-                    error=ProcessingError(
-                        error_type="VALIDATION_ERROR",
-                        error_message="File does not appear to be a valid PDF"
-                    )
-                )
+            validation_error = self._validate_file(read_source_header(file_content), file_size)
+            if validation_error is not None:
+                return validation_error
             
             logger.info("✅ File validation passed")
             
-            # Create PDF document record
-            pdf_doc = PDFDocument(
-                filename=self._generate_filename(original_filename),
-                original_filename=original_filename,
-                file_size=len(file_content),
-                upload_timestamp=datetime.now(),
-                processing_status=ProcessingStatus.PENDING,
-                subject=subject,
-                description=description,
-                metadata=metadata or {}
-            )
+            # Build the stored metadata once, with user_id for user-specific storage
+            md = metadata if metadata is not None else {}
+            if user_id:
+                if assume_owned:
+                    md["user_id"] = user_id
+                else:
+                    md = {**md, "user_id": user_id}
             
-            logger.info("💾 Saving initial PDF document record...")
-            # Save initial document record with user-specific access
-            try:
-                # Get or create subject for the user
+            done_indexes = set()
+            # Hash off the event loop: a large upload would otherwise stall every request
+            content_hash = await asyncio.to_thread(hash_source, file_content)
+            resume_pdf_id = md.get("resume_pdf_id") if try_resume else None
+            if resume_pdf_id:
+                # Resume a previous attempt: keep chunks already stored with embeddings
+                resume_doc = await self.db_manager.get_pdf_document(resume_pdf_id, user_id=user_id)
+                if not resume_doc:
+                    raise ValueError(f"Cannot resume PDF {resume_pdf_id}: document not found")
+                # Kept chunks are only valid for the same file; without a stored hash there
+                # is no way to tell
+                if resume_doc.get('content_sha256') != content_hash:
+                    raise ValueError(f"Cannot resume PDF {resume_pdf_id}: uploaded file does not match its content")
+                if not await self.db_manager.claim_pdf_for_resume(resume_pdf_id):
+                    raise ValueError(f"Cannot resume PDF {resume_pdf_id}: it is completed or already being processed")
+                pdf_id = resume_pdf_id
+                stored_chunks = await self.db_manager.list_chunks_by_pdf(pdf_id, embedded_only=True)
+                done_indexes = {chunk['chunk_index'] for chunk in stored_chunks}
+                await self.db_manager.delete_pdf_chunks(pdf_id, exclude_indexes=done_indexes)
+                logger.info(f"♻️ Resuming PDF {pdf_id}: {len(done_indexes)} chunks already stored")
+            else:
+                # Skip the whole pipeline if this user already uploaded identical content
+                existing = None
                 if user_id:
-                    subject_name = subject or "General"
-                    user_subject = await self.db_manager.get_subject_by_name(user_id, subject_name)
-                    if not user_subject:
-                        # Create subject for the user
-                        subject_result = await self.db_manager.create_subject(
-                            user_id=user_id,
-                            name=subject_name,
-                            description=f"Auto-created subject for {subject_name} uploads"
-                        )
-                        if subject_result.get('success'):
-                            subject_id = subject_result['data']['id']
+                    existing = await self.db_manager.get_pdf_by_hash(user_id, content_hash)
+                    if existing and not self.db_manager.is_pdf_claimable(existing):
+                        return self._duplicate_response(existing, original_filename, start_time)
+                
+                # Create PDF document record
+                pdf_doc = PDFDocument(
+                    filename=self._generate_filename(original_filename),
+                    original_filename=original_filename,
+                    file_size=file_size,
+                    upload_timestamp=datetime.now(),
+                    processing_status=ProcessingStatus.PENDING,
+                    subject=subject,
+                    description=description,
+                    metadata=md
+                )
+                
+                logger.info("💾 Saving initial PDF document record...")
+                # Save initial document record with user-specific access
+                try:
+                    # Get or create subject for the user
+                    if user_id:
+                        subject_name = subject or "General"
+                        user_subject = await self.db_manager.get_subject_by_name(user_id, subject_name)
+                        if not user_subject:
+                            # Create subject for the user
+                            subject_result = await self.db_manager.create_subject(
+                                user_id=user_id,
+                                name=subject_name,
+                                description=f"Auto-created subject for {subject_name} uploads"
+                            )
+                            if subject_result.get('success'):
+                                subject_id = subject_result['data']['id']
+                            else:
+                                raise Exception(f"Failed to create subject: {subject_result}")
                         else:
-                            raise Exception(f"Failed to create subject: {subject_result}")
+                            subject_id = user_subject['id']
                     else:
-                        subject_id = user_subject['id']
-                else:
-                    # Fallback to system user (for backward compatibility)
-                    subject_id = "6866db7e-0acc-43fe-8d02-1069d59a3798"  # Use existing "General" subject
-                
-                # Store user_id in metadata for the PDF document
-                metadata_with_user = {**(metadata or {}), "user_id": user_id} if user_id else (metadata or {})
+                        # Fallback to system user (for backward compatibility)
+                        subject_id = "6866db7e-0acc-43fe-8d02-1069d59a3798"  # Use existing "General" subject
                 
-                pdf_record = await self.db_manager.create_pdf_record(
-                    filename=pdf_doc.filename,
-                    original_filename=pdf_doc.original_filename,
-                    subject_id=subject_id,
-                    file_path="",  # We're not storing files, just processing them
-                    file_size=pdf_doc.file_size,
-                    total_pages=getattr(pdf_doc, 'total_pages', None),
-                    metadata=metadata_with_user,
-                    user_id=user_id  # Pass user_id to database manager
-                )
-                print(f"DEBUG: pdf_record = {pdf_record}")
-                if pdf_record.get('success'):
-                    pdf_id = pdf_record['data']['id']
-                else:
-                    raise Exception(f"Database operation failed: {pdf_record}")
-                logger.info(f"✅ PDF document saved with ID: {pdf_id} for user: {user_id}")
-            except Exception as db_error:
-                print(f"DEBUG: Database error: {str(db_error)}")
-                raise db_error
+                    if existing:
+                        # An earlier attempt failed, never started or was abandoned mid-pipeline:
+                        # reuse its row (the hash is unique per user) instead of inserting a second one
+                        claimed = await self.db_manager.claim_pdf_for_retry(
+                            existing['id'],
+                            filename=pdf_doc.filename,
+                            original_filename=pdf_doc.original_filename,
+                            subject_id=subject_id,
+                            file_size=pdf_doc.file_size,
+                            metadata=md
+                        )
+                        if not claimed:
+                            # A concurrent upload of the same content claimed it first
+                            latest = await self.db_manager.get_pdf_by_hash(user_id, content_hash)
+                            return self._duplicate_response(latest or existing, original_filename, start_time)
+                        pdf_id = existing['id']
+                        await self.db_manager.delete_pdf_chunks(pdf_id)
+                        logger.info(f"♻️ Retrying earlier upload of {original_filename} as PDF {pdf_id}")
+                    else:
+                        pdf_record = await self.db_manager.create_pdf_record(
+                            filename=pdf_doc.filename,
+                            original_filename=pdf_doc.original_filename,
+                            subject_id=subject_id,
+                            file_path="",  # We're not storing files, just processing them
+                            file_size=pdf_doc.file_size,
+                            total_pages=getattr(pdf_doc, 'total_pages', None),
+                            metadata=md,
+                            user_id=user_id,  # Pass user_id to database manager
+                            content_sha256=content_hash,
+                            # Born 'processing' so concurrent duplicates never treat it as retryable
+                            processing_status="processing"
+                        )
+                        logger.debug("pdf_record = %r", pdf_record)
+                        if not pdf_record.get('success'):
+                            # A concurrent upload of the same content may have won the
+                            # (user_id, content_sha256) unique index
+                            latest = await self.db_manager.get_pdf_by_hash(user_id, content_hash) if user_id else None
+                            if latest:
+                                return self._duplicate_response(latest, original_filename, start_time)
+                            raise Exception(f"Database operation failed: {pdf_record}")
+                        pdf_id = pdf_record['data']['id']
+                    logger.info(f"✅ PDF document saved with ID: {pdf_id} for user: {user_id}")
+                except Exception as db_error:
+                    logger.debug("Database error: %s", db_error)
+                    raise db_error
             
             # Update status to processing
             logger.info("🔄 Updating status to PROCESSING...")
@@ -172,8 +250,10 @@ class PDFProcessor:
             logger.info("📖 Step 1: Starting text extraction...")
             try:
                 with profiler.profile_phase("text_extraction"):
+                    # Reuse the dedup digest as the extraction cache key instead of hashing twice
                     chunks_data, extraction_metadata = await self.text_extractor.extract_text(
-                        file_content, original_filename
+                        file_content, original_filename,
+                        content_digest=bytes.fromhex(content_hash)
                     )
                 
                 if not chunks_data:
@@ -182,6 +262,11 @@ class PDFProcessor:
                 logger.info(f"✅ Extracted {len(chunks_data)} text chunks from {original_filename}")
                 logger.info(f"📊 Extraction metadata: {extraction_metadata}")
                 
+                # Only embed and save chunks a previous attempt didn't already store
+                if done_indexes:
+                    chunks_data = [chunk for chunk in chunks_data if chunk.chunk_index not in done_indexes]
+                    logger.info(f"♻️ {len(chunks_data)} chunks left to process after resume")
+                
             except Exception as e:
                 error_msg = f"Text extraction failed: {str(e)}"
                 logger.error(f"❌ {error_msg}")
@@ -202,31 +287,28 @@ class PDFProcessor:
             logger.info("🔮 Step 2: Starting embedding generation...")
             try:
                 with profiler.profile_phase("embedding_generation"):
-                    chunks_with_embeddings = await self.embedding_generator.generate_embeddings(chunks_data)
+                    chunks_with_embeddings, embeddings = await self.embedding_generator.generate_embeddings(chunks_data)
                 logger.info(f"✅ Generated embeddings for {original_filename}")
                 
             except Exception as e:
                 logger.warning(f"⚠️ Embedding generation failed: {str(e)}. Proceeding without embeddings.")
                 chunks_with_embeddings = chunks_data
-                # Set embeddings to None for all chunks
-                for chunk in chunks_with_embeddings:
-                    chunk["embedding"] = None
+                embeddings = None
             
             # Step 3: Create PDFChunk objects
+            # Embeddings stay in the float32 array until the DB insert in Step 4
             logger.info("🧩 Step 3: Creating PDF chunk objects...")
             pdf_chunks = []
-            for i, chunk_data in enumerate(chunks_with_embeddings):
-                logger.debug(f"Processing chunk {i+1}/{len(chunks_with_embeddings)}")
+            for chunk_data in chunks_with_embeddings:
                 pdf_chunk = PDFChunk(
                     pdf_id=pdf_id,
-                    chunk_index=chunk_data["chunk_index"],
-                    content=chunk_data["content"],
-                    page_number=chunk_data["page_number"],
-                    chunk_size=chunk_data["chunk_size"],
-                    embedding=chunk_data.get("embedding"),
+                    chunk_index=chunk_data.chunk_index,
+                    content=chunk_data.content,
+                    page_number=chunk_data.page_number,
+                    chunk_size=chunk_data.chunk_size,
                     metadata={
-                        "start_char": chunk_data.get("start_char"),
-                        "end_char": chunk_data.get("end_char"),
+                        "start_char": chunk_data.start_char,
+                        "end_char": chunk_data.end_char,
                         "extraction_method": extraction_metadata.get("extraction_method")
                     }
                 )
@@ -240,20 +322,21 @@ class PDFProcessor:
                 # Convert PDFChunk objects to dictionaries for database insertion
                 # Only include fields that exist in the database schema
                 chunk_dicts = []
-                for chunk in pdf_chunks:
+                token_counts = count_tokens([chunk.content for chunk in pdf_chunks])  # Approximate token counts
+                for i, chunk in enumerate(pdf_chunks):
                     chunk_dict = {
                         "pdf_id": chunk.pdf_id,
                         "content": chunk.content,
                         "chunk_index": chunk.chunk_index,
                         "page_number": chunk.page_number,
-                        "embedding": chunk.embedding,
-                        "token_count": len(chunk.content.split()) if chunk.content else 0,  # Approximate token count
+                        "embedding": embeddings[i].tolist() if embeddings is not None else None,
+                        "token_count": token_counts[i],
                         "metadata": chunk.metadata or {}
                     }
                     chunk_dicts.append(chunk_dict)
                 
                 with profiler.profile_phase("database_save"):
-                    success = await self.db_manager.batch_create_chunks(chunk_dicts)
+                    success = await self._insert_chunks_batched(pdf_id, chunk_dicts, done_indexes)
                 if not success.get('success', False):
                     raise ValueError(f"Failed to save chunks to database: {success.get('error', 'Unknown error')}")
                 logger.info("✅ Chunks saved to database successfully")
@@ -275,9 +358,12 @@ class PDFProcessor:
                 )
             
             # Step 5: Update final status
+            total_chunks = len(done_indexes) + len(pdf_chunks)
             logger.info("🏁 Step 5: Updating final status to COMPLETED...")
+            # A placeholder document must not be handed out as the duplicate of a later upload
+            reusable = extraction_metadata.get("extraction_method") not in _PLACEHOLDER_EXTRACTION_METHODS
             await self.db_manager.update_pdf_processing_status(
-                pdf_id, "completed", chunk_count=len(pdf_chunks)
+                pdf_id, "completed", chunk_count=total_chunks, reusable=reusable
             )
             logger.info("✅ Status updated to COMPLETED")
             
@@ -287,13 +373,13 @@ class PDFProcessor:
             processing_time = time.time() - start_time
             
             logger.info(f"🎉 Successfully processed {original_filename} in {processing_time:.2f}s")
-            logger.info(f"📊 Final stats: {len(pdf_chunks)} chunks processed")
+            logger.info(f"📊 Final stats: {total_chunks} chunks processed")
             
             return ProcessingResponse(
                 success=True,
-                message=f"Successfully processed PDF with {len(pdf_chunks)} chunks",
+                message=f"Successfully processed PDF with {total_chunks} chunks",
                 pdf_id=pdf_id,
-                total_chunks=len(pdf_chunks),
+                total_chunks=total_chunks,
                 processing_time=processing_time
             )
             
@@ -339,12 +425,90 @@ class PDFProcessor:
         """Delete a PDF and all its chunks - user-specific access."""
         return await self.db_manager.delete_pdf_document(pdf_id, user_id=user_id)
     
+    def _duplicate_response(self, existing: Dict[str, Any], original_filename: str,
+                            start_time: float) -> ProcessingResponse:
+        """Build the response for an upload whose content this user already uploaded."""
+        if existing.get('processing_status') == "completed":
+            logger.info(f"♻️ Duplicate upload of {original_filename}, reusing PDF {existing['id']}")
+            return ProcessingResponse(
+                success=True,
+                message="Duplicate, reusing existing",
+                pdf_id=existing['id'],
+                total_chunks=existing.get('chunk_count'),
+                processing_time=time.time() - start_time
+            )
+        logger.info(f"⏳ Duplicate upload of {original_filename}, PDF {existing['id']} is already being processed")
+        return ProcessingResponse(
+            success=True,
+            message="Duplicate, already being processed",
+            pdf_id=existing['id'],
+            processing_time=time.time() - start_time
+        )
+    
+    def _validate_file(self, header: bytes, file_size: int) -> Optional[ProcessingResponse]:
+        """Validate PDF header and size; return an error response, or None if valid."""
+        max_file_size = 50 * 1024 * 1024  # 50MB
+        if file_size and file_size <= max_file_size and header == b'%PDF':
+            return None
+        
+        if not file_size:
+            logger.error("❌ Empty file content provided")
+            message, error_message = "Empty file content provided", "Empty file content"
+        elif file_size > max_file_size:
+            logger.error(f"❌ File too large: {file_size} bytes (max: {max_file_size})")
+            message = f"File too large. Maximum size is {max_file_size // 1024 // 1024}MB"
+            error_message = f"File size {file_size} exceeds limit {max_file_size}"
+        else:
+            logger.error("❌ Invalid PDF format")
+            message, error_message = "Invalid PDF format", "File does not appear to be a valid PDF"
+        
+        return ProcessingResponse(
+            success=False,
+            message=message,
+            error=ProcessingError(
+                error_type="VALIDATION_ERROR",
+                error_message=error_message
+            )
+        )
+    
+    async def _insert_chunks_batched(self,
+                                     pdf_id: str,
+                                     chunk_dicts: List[Dict[str, Any]],
+                                     keep_indexes: Set[int],
+                                     batch_size: int = 500,
+                                     concurrency: int = 4) -> Dict[str, Any]:
+        """
+        Insert chunks in fixed-size sub-batches with bounded concurrency.
+        
+        Keeps each insert request well below the Postgres parameter limit and
+        avoids holding a single connection for the whole document. Batches run
+        concurrently on worker threads, so when any of them fails the ones that
+        succeeded are deleted again (chunks in keep_indexes, stored by an earlier
+        attempt, are left alone) and a retry starts from a clean slate.
+        """
+        sem = asyncio.Semaphore(concurrency)
+        
+        async def _insert_batch(batch: List[Dict[str, Any]]) -> Dict[str, Any]:
+            async with sem:
+                return await self.db_manager.batch_create_chunks(batch)
+        
+        results = await asyncio.gather(*[
+            _insert_batch(chunk_dicts[i:i + batch_size])
+            for i in range(0, len(chunk_dicts), batch_size)
+        ])
+        
+        errors = [r.get('error', 'Unknown error') for r in results if not r.get('success', False)]
+        if errors:
+            await self.db_manager.delete_pdf_chunks(pdf_id, exclude_indexes=keep_indexes)
+            return {"success": False, "error": "; ".join(errors)}
+        return {"success": True, "count": sum(r.get('count', 0) for r in results)}
+    
     def _generate_filename(self, original_filename: str) -> str:
         """Generate a unique filename for storage."""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        timestamp = time.strftime("%Y%m%d_%H%M%S")
         name_part = os.path.splitext(original_filename)[0]
         # Clean filename for safe storage
-        clean_name = "".join(c for c in name_part if c.isalnum() or c in (' ', '-', '_')).rstrip()
+        clean_name = name_part.encode("ascii", "ignore").decode().translate(_FILENAME_TRANS).rstrip()
         return f"{timestamp}_{clean_name}.pdf"
     
     def is_embedding_available(self) -> bool:
@@ -4,16 +4,204 @@ PDF Text Extractor
 Handles extraction of text content from PDF files with automatic fallbacks.
 """
 
-import io
+import os
+import array
+import sys
+import atexit
+import re
+import bisect
 import logging
 import asyncio
-from typing import List, Dict, Any, Tuple
+import threading
+import warnings
+import concurrent.futures
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Deque, IO
 import PyPDF2
 import pdfplumber
-from ..models.pdf_models import ProcessingError
+from ..models.pdf_models import ProcessingError, TextChunk
+from ..utils.pdf_source import (
+    PDFSource, get_source_size, open_source_stream, is_file_source, fingerprint_source
+)
+from utils.pdf_page_worker import extract_page_range, extract_shared_page_range, iter_page_texts
 
 logger = logging.getLogger(__name__)
 
+# Last sentence end ('.') in a window, or failing that the last space; the character before
+# the boundary must lie past the window start
+_BOUNDARY_RE = re.compile(r"(?s:.+\.|.+(?= ))")
+
+_process_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_thread_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+
+
+# Each worker holds its own copy of the PDF and parser state, so stay well below a core per
+# worker on large hosts
+_PROCESS_POOL_WORKERS = min(4, os.cpu_count() or 1)
+
+
+def _get_process_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """Get the shared process pool used for page-parallel extraction (created on first use)."""
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=_PROCESS_POOL_WORKERS)
+    return _process_pool
+
+
+def _get_thread_pool() -> concurrent.futures.ThreadPoolExecutor:
+    """Get the shared thread pool that runs blocking extraction off the event loop (created on first use)."""
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="pdf-extract")
+    return _thread_pool
+
+
+_stderr_lock = threading.Lock()
+_stderr_users = 0
+_saved_stderr = None
+
+
+@contextmanager
+def _redirect_stderr_shared(sink):
+    """
+    Redirect sys.stderr to sink while any extraction thread is inside the block.
+    
+    contextlib.redirect_stderr is not safe across threads: overlapping exits can restore
+    the wrong stream and leave stderr silenced. This keeps a count and restores the
+    original stream when the last user leaves.
+    """
+    global _stderr_users, _saved_stderr
+    with _stderr_lock:
+        if _stderr_users == 0:
+            _saved_stderr = sys.stderr
+            sys.stderr = sink
+        _stderr_users += 1
+    try:
+        yield
+    finally:
+        with _stderr_lock:
+            _stderr_users -= 1
+            if _stderr_users == 0:
+                sys.stderr = _saved_stderr
+                _saved_stderr = None
+
+
+class _ChunkEmitter:
+    """
+    Split streamed page text into overlapping chunks as it arrives.
+    
+    Pages are fed in order and chunks are emitted as soon as more than ``chunk_size``
+    characters are buffered, so the whole document text is never held in memory. Chunk
+    boundaries match ``PDFTextExtractor._create_chunks``; page numbers come from the
+    offsets at which each page's text started rather than a proportional estimate.
+    """
+    
+    def __init__(self, chunk_size: int, chunk_overlap: int, byte_budget: int = 50 * 1024 * 1024):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.byte_budget = byte_budget  # Total chunk content allowed, counted in characters
+        self.chunks: List[TextChunk] = []
+        self._emitted_chars = 0
+        self.total_chars = 0
+        self._buffer: Deque[str] = deque()
+        self._buffered_len = 0
+        self._buffer_offset = 0  # Document offset of the first buffered character
+        # Document offset where each fed page's text starts, and that page's number
+        # (pages without text are never fed, so numbers can skip)
+        self._page_starts = array.array('Q')
+        self._page_numbers = array.array('I')
+    
+    @property
+    def full(self) -> bool:
+        return self._emitted_chars >= self.byte_budget
+    
+    def feed(self, page_text: str, page_num: int):
+        """Append a page's text and emit every chunk that no longer depends on later pages."""
+        self._page_starts.append(self.total_chars)
+        self._page_numbers.append(page_num)
+        self.total_chars += len(page_text)
+        if self.full:
+            return
+        
+        self._buffer.append(page_text)
+        self._buffered_len += len(page_text)
+        if self._buffered_len > self.chunk_size:
+            self._emit(final=False)
+    
+    def finalize(self) -> List[TextChunk]:
+        """Emit the remaining buffered text and return all chunks."""
+        if not self.chunks and not self.full:
+            # Short documents become a single chunk, as in _create_chunks
+            text = "".join(self._buffer).strip()
+            if len(text) <= self.chunk_size:
+                self._buffer.clear()
+                self._buffered_len = 0
+                if text:
+                    self.chunks.append(TextChunk(
+                        content=text,
+                        chunk_index=0,
+                        page_number=self._page_numbers[0] if self._page_numbers else 1,
+                        chunk_size=len(text),
+                        start_char=0,
+                        end_char=len(text)
+                    ))
+                return self.chunks
+        
+        if self._buffered_len and not self.full:
+            self._emit(final=True)
+        
+        if self.full:
+            logger.warning(f"Chunk budget reached ({self.byte_budget // 1024 // 1024}MB), text may be truncated")
+        return self.chunks
+    
+    def _page_at(self, offset: int) -> int:
+        """Return the page number whose text contains the given document offset."""
+        index = bisect.bisect_right(self._page_starts, offset) - 1
+        return self._page_numbers[max(index, 0)]
+    
+    def _emit(self, final: bool):
+        """Cut chunks from the buffer; unless final, stop while the next window could still grow."""
+        text = "".join(self._buffer)
+        start = 0
+        
+        while start < len(text) and not self.full:
+            if not final and len(text) - start <= self.chunk_size:
+                break
+            
+            end = start + self.chunk_size
+            
+            # If we're not at the end, try to break at a sentence or word boundary
+            if end < len(text):
+                boundary = _BOUNDARY_RE.match(text, start, end)
+                if boundary:
+                    end = boundary.end()
+            
+            chunk_content = text[start:end].strip()
+            if chunk_content:
+                self.chunks.append(TextChunk(
+                    content=chunk_content,
+                    chunk_index=len(self.chunks),
+                    page_number=self._page_at(self._buffer_offset + start),
+                    chunk_size=len(chunk_content),
+                    start_char=self._buffer_offset + start,
+                    end_char=self._buffer_offset + end
+                ))
+                self._emitted_chars += len(chunk_content)
+            
+            # Move start position (with overlap); when the chunk was shorter than the overlap,
+            # continue from its end so an early boundary isn't re-emitted char by char
+            start = end if end - self.chunk_overlap <= start else end - self.chunk_overlap
+        
+        # Keep the unconsumed tail (including the overlap) as the new buffer head
+        tail = text[start:] if not self.full else ""
+        self._buffer.clear()
+        if tail:
+            self._buffer.append(tail)
+        self._buffered_len = len(tail)
+        self._buffer_offset += start
+
 
 class PDFTextExtractor:
     """
@@ -24,94 +212,146 @@ class PDFTextExtractor:
     - Automatic timeout handling to prevent hanging on problematic PDFs
     - Chunking text for embedding and retrieval
     - Robust error handling with graceful degradation
+    - Page-parallel extraction on a process pool for multi-page PDFs
     """
     
+    # Every page-parallel batch copies the PDF and re-parses its structure before reaching
+    # its pages, so batches must be large enough to amortize that
+    _MIN_PAGE_BATCH = 25
+    
+    # (max_pages, max_bytes, methods) rules for picking the extraction order, checked in
+    # order; None means no limit. Short, small PDFs are usually simple text where PyPDF2
+    # is several times faster than pdfplumber's layout analysis. Larger PDFs keep
+    # pdfplumber first and switch to page-parallel extraction past parallel_min_pages.
+    _RULES = (
+        (10, 2_000_000, ("pypdf2", "pdfplumber")),
+        (None, None, ("pdfplumber", "pypdf2")),
+    )
+    _METHOD_LABELS = {"pdfplumber": "pdfplumber", "pypdf2": "PyPDF2"}
+    
+    # Shared stderr sink for pdfplumber, opened once per process
+    _devnull: Optional[IO[str]] = None
+    _devnull_lock = threading.Lock()
+    
     def __init__(self):
         self.chunk_size = 2000  # Increased chunk size for better efficiency
         self.chunk_overlap = 150  # Reduced overlap
         self.extraction_timeout = 45  # Increased timeout for large PDFs
         self.max_file_size = 100 * 1024 * 1024  # Increased to 100MB limit
+        self.max_file_size_mb = self.max_file_size >> 20
         self.max_pages = 1000  # Increased page limit
         self.max_chars_per_page = 15000  # Increased character limit
+        self.chunk_byte_budget = 50 * 1024 * 1024  # Cap on total chunk content per document
+        self.parallel_min_pages = 2 * self._MIN_PAGE_BATCH  # Smaller PDFs aren't worth the process-pool dispatch
+        self._devnull = self._get_devnull()
+        self._executor = _get_thread_pool()
+        # Recent (chunks, metadata) results for re-uploads, keyed by content fingerprint and
+        # the settings that shape the chunks (see _result_cache_key)
+        self._result_cache: "OrderedDict[Tuple[bytes, int, int, int], Tuple[List[TextChunk], Dict[str, Any]]]" = OrderedDict()
+        self._result_cache_max = 64
+        self._result_cache_max_chars = 64 * 1024 * 1024
+        self._result_cache_chars = 0
+    
+    @classmethod
+    def _get_devnull(cls) -> IO[str]:
+        """Open the shared os.devnull handle on first use and close it at interpreter exit."""
+        with cls._devnull_lock:
+            if cls._devnull is None:
+                cls._devnull = open(os.devnull, 'w')
+                atexit.register(cls._devnull.close)
+            return cls._devnull
     
-    async def extract_text(self, pdf_content: bytes, filename: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    async def extract_text(self, pdf_content: PDFSource, filename: str,
+                           content_digest: Optional[bytes] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
         """
         Extract text from PDF using multiple methods with fallbacks and timeouts.
         
         Args:
-            pdf_content: Raw PDF file content as bytes
+            pdf_content: Raw PDF content as bytes/memoryview, or a seekable binary file object
             filename: Original filename for error reporting
+            content_digest: Digest of the content the caller already computed (e.g. SHA-256),
+                used as the result cache key instead of fingerprinting the content again
             
         Returns:
             Tuple of (chunks_list, metadata_dict)
         """
+        pdf_size = get_source_size(pdf_content)
+        size_kb = pdf_size >> 10
         logger.info(f"📖 Starting text extraction for {filename}")
-        logger.info(f"📊 PDF content size: {len(pdf_content) // 1024} KB")
+        logger.info(f"📊 PDF content size: {size_kb} KB")
         
         # Safety check: file size limit
-        if len(pdf_content) > self.max_file_size:
-            error_msg = f"PDF file too large: {len(pdf_content) // 1024 // 1024}MB (max: {self.max_file_size // 1024 // 1024}MB)"
+        if pdf_size > self.max_file_size:
+            error_msg = f"PDF file too large: {size_kb >> 10}MB (max: {self.max_file_size_mb}MB)"
             logger.error(error_msg)
-            return [{
-                "content": f"PDF file '{filename}' is too large to process safely. Maximum size is {self.max_file_size // 1024 // 1024}MB.",
-                "chunk_index": 0,
-                "page_number": 1,
-                "chunk_size": 50,
-                "start_char": 0,
-                "end_char": 50
-            }], {
+            return [TextChunk(
+                content=f"PDF file '{filename}' is too large to process safely. Maximum size is {self.max_file_size_mb}MB.",
+                chunk_index=0,
+                page_number=1,
+                chunk_size=50,
+                start_char=0,
+                end_char=50
+            )], {
                 "extraction_method": "size_limit_exceeded",
                 "total_pages": 0,
                 "error": error_msg
             }
         
+        # BytesIO(bytes) shares the immutable buffer, but BytesIO(memoryview) copies it, so
+        # materialize other buffers once here instead of once per tier. Each tier opens its
+        # own stream (file objects get an independent cursor), so a timed-out tier that is
+        # still running never disturbs the next one.
+        if not is_file_source(pdf_content) and not isinstance(pdf_content, bytes):
+            pdf_content = bytes(pdf_content)
+        
+        # Identical content extracts identically, so serve repeat uploads from the cache
+        loop = asyncio.get_running_loop()
+        if content_digest is None:
+            content_digest = await loop.run_in_executor(self._executor, fingerprint_source, pdf_content)
+        cache_key = self._result_cache_key(content_digest)
+        cached = self._result_cache.get(cache_key)
+        if cached is not None:
+            self._result_cache.move_to_end(cache_key)
+            logger.info(f"♻️ Reusing cached extraction for {filename} ({len(cached[0])} chunks)")
+            return list(cached[0]), dict(cached[1])
+        
         # Store errors for diagnostic purposes
         extraction_errors = []
         
-        # Attempt pdfplumber extraction with timeout
-        try:
-            logger.info("🔍 Attempting extraction with pdfplumber (timeout: %ds)...", self.extraction_timeout)
-            extraction_task = self._extract_with_pdfplumber(pdf_content)
-            chunks, metadata = await asyncio.wait_for(extraction_task, timeout=self.extraction_timeout)
-            
-            if chunks:
-                logger.info(f"✅ Successfully extracted {len(chunks)} chunks from {filename} using pdfplumber")
-                return chunks, metadata
+        # Count pages once up front so fallback tiers don't re-parse the file for it; a
+        # failed or slow probe only loses that hint
+        known_page_count = await self._probe_page_count(pdf_content)
+        
+        # Try the extraction tiers in the order the rules pick for this PDF
+        for method in self._select_methods(pdf_size, known_page_count):
+            label = self._METHOD_LABELS[method]
+            try:
+                logger.info("🔍 Attempting extraction with %s (timeout: %ds)...", label, self.extraction_timeout)
+                if method == "pypdf2":
+                    extract = self._extract_with_pypdf2
+                else:
+                    extract = self._extract_with_pdfplumber
+                chunks, metadata = await extract(pdf_content, known_page_count, timeout=self.extraction_timeout)
                 
-        except asyncio.TimeoutError:
-            error_msg = f"⚠️ pdfplumber extraction timed out after {self.extraction_timeout}s for {filename}"
-            logger.warning(error_msg)
-            extraction_errors.append(f"pdfplumber error: Timed out after {self.extraction_timeout}s")
-            
-        except Exception as e:
-            error_msg = f"⚠️ pdfplumber extraction failed for {filename}: {str(e)}"
-            logger.warning(error_msg)
-            extraction_errors.append(f"pdfplumber error: {str(e)}")
-            
-        # Attempt PyPDF2 extraction with timeout
-        try:
-            logger.info("🔍 Attempting extraction with PyPDF2 (timeout: %ds)...", self.extraction_timeout)
-            extraction_task = self._extract_with_pypdf2(pdf_content)
-            chunks, metadata = await asyncio.wait_for(extraction_task, timeout=self.extraction_timeout)
-            
-            if chunks:
-                logger.info(f"✅ Successfully extracted {len(chunks)} chunks from {filename} using PyPDF2")
-                return chunks, metadata
+                if chunks:
+                    logger.info(f"✅ Successfully extracted {len(chunks)} chunks from {filename} using {label}")
+                    self._cache_result(cache_key, chunks, metadata)
+                    return chunks, metadata
+                    
+            except asyncio.TimeoutError:
+                error_msg = f"⚠️ {label} extraction timed out after {self.extraction_timeout}s for {filename}"
+                logger.warning(error_msg)
+                extraction_errors.append(f"{label} error: Timed out after {self.extraction_timeout}s")
                 
-        except asyncio.TimeoutError:
-            error_msg = f"⚠️ PyPDF2 extraction timed out after {self.extraction_timeout}s for {filename}"
-            logger.warning(error_msg)
-            extraction_errors.append(f"PyPDF2 error: Timed out after {self.extraction_timeout}s")
-            
-        except Exception as e:
-            error_msg = f"⚠️ PyPDF2 extraction failed for {filename}: {str(e)}"
-            logger.warning(error_msg)
-            extraction_errors.append(f"PyPDF2 error: {str(e)}")
+            except Exception as e:
+                error_msg = f"⚠️ {label} extraction failed for {filename}: {str(e)}"
+                logger.warning(error_msg)
+                extraction_errors.append(f"{label} error: {str(e)}")
         
         # Use basic fallback extraction if all else fails
         logger.info("🔍 Using basic fallback extraction method")
         try:
-            chunks, metadata = await self._extract_basic(pdf_content)
+            chunks, metadata = await self._extract_basic(pdf_content, known_page_count)
             logger.info(f"✅ Created fallback content for {filename}")
             
             # Add error information to metadata
@@ -125,14 +365,14 @@ class PDFTextExtractor:
             logger.error(f"All PDF extraction methods failed for {filename}: {str(e)}")
             
             # Emergency fallback - never fail the PDF upload
-            minimal_fallback = [{
-                "content": f"This PDF ({filename}) could not be processed due to formatting issues.",
-                "chunk_index": 0,
-                "page_number": 1,
-                "chunk_size": 60,
-                "start_char": 0,
-                "end_char": 60
-            }]
+            minimal_fallback = [TextChunk(
+                content=f"This PDF ({filename}) could not be processed due to formatting issues.",
+                chunk_index=0,
+                page_number=1,
+                chunk_size=60,
+                start_char=0,
+                end_char=60
+            )]
             return minimal_fallback, {
                 "extraction_method": "emergency_fallback", 
                 "total_pages": 1, 
@@ -140,7 +380,143 @@ class PDFTextExtractor:
                 "extraction_errors": extraction_errors
             }
     
-    async def _extract_with_pdfplumber(self, pdf_content: bytes) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    def _select_methods(self, pdf_size: int, page_count: Optional[int]) -> Tuple[str, ...]:
+        """Pick the extraction method order for a PDF from _RULES (pdfplumber first if the page count is unknown)."""
+        if page_count is not None:
+            for max_pages, max_bytes, methods in self._RULES:
+                if (max_pages is None or page_count <= max_pages) and (max_bytes is None or pdf_size < max_bytes):
+                    return methods
+        return ("pdfplumber", "pypdf2")
+    
+    def _result_cache_key(self, content_digest: bytes) -> Tuple[bytes, int, int, int]:
+        """Cache key for an extraction: the same content chunked with other settings differs."""
+        return content_digest, self.chunk_size, self.chunk_overlap, self.max_chars_per_page
+    
+    def _cache_result(self, cache_key: Tuple[bytes, int, int, int], chunks: List[TextChunk], metadata: Dict[str, Any]):
+        """Remember a successful extraction, evicting least recently used entries when full."""
+        size = sum(chunk.chunk_size for chunk in chunks)
+        if size > self._result_cache_max_chars or cache_key in self._result_cache:
+            return
+        self._result_cache[cache_key] = (list(chunks), dict(metadata))
+        self._result_cache_chars += size
+        while (len(self._result_cache) > self._result_cache_max
+               or self._result_cache_chars > self._result_cache_max_chars):
+            _, (evicted, _) = self._result_cache.popitem(last=False)
+            self._result_cache_chars -= sum(chunk.chunk_size for chunk in evicted)
+    
+    async def _run_in_executor(self, timeout: Optional[float], fn, *args):
+        """
+        Run fn(*args) on the extraction thread pool, timing out only once it has started.
+        
+        Time spent queued behind other uploads' work doesn't count against the timeout, so
+        a busy pool can't make a step "time out" before it ever ran.
+        """
+        loop = asyncio.get_running_loop()
+        started = asyncio.Event()
+        
+        def run():
+            loop.call_soon_threadsafe(started.set)
+            return fn(*args)
+        
+        future = loop.run_in_executor(self._executor, run)
+        if timeout is None:
+            return await future
+        await started.wait()
+        return await asyncio.wait_for(future, timeout=timeout)
+    
+    async def _probe_page_count(self, pdf_content: PDFSource, timeout: float = 2.0) -> Optional[int]:
+        """Read the page count with PyPDF2 (no text extraction), or None if it fails or times out."""
+        def probe() -> int:
+            with open_source_stream(pdf_content) as pdf_file:
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    return len(PyPDF2.PdfReader(pdf_file).pages)
+        
+        try:
+            return await self._run_in_executor(timeout, probe)
+        except asyncio.TimeoutError:
+            logger.warning(f"Page count probe timed out after {timeout}s")
+        except Exception as e:
+            logger.warning(f"Page count probe failed: {str(e)[:100]}")
+        return None
+    
+    def extract_text_page_range(self, pdf_content: bytes, start: int, end: int,
+                                method: str = "pdfplumber") -> List[Tuple[int, str]]:
+        """Extract (page_number, text) pairs for pages [start, end) using pdfplumber or PyPDF2."""
+        return extract_page_range(pdf_content, start, end, method, self.max_chars_per_page)
+    
+    def _page_batch_size(self, total_pages: int) -> int:
+        """Pick how many pages each worker task extracts: about two batches per worker."""
+        return max(self._MIN_PAGE_BATCH, -(-total_pages // (2 * _PROCESS_POOL_WORKERS)))
+    
+    def _extract_pages_parallel(self, pdf_content: PDFSource, pages_to_process: int,
+                                method: str) -> List[Tuple[int, str]]:
+        """Extract pages in batches on the shared process pool, returning results in page order."""
+        # Publish the PDF once in shared memory; batches only pickle the segment name, not
+        # a full copy of the document each
+        size = get_source_size(pdf_content)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        batches = []
+        try:
+            if is_file_source(pdf_content):
+                with open_source_stream(pdf_content) as pdf_file:
+                    offset = 0
+                    for block in iter(lambda: pdf_file.read(1 << 20), b""):
+                        shm.buf[offset:offset + len(block)] = block
+                        offset += len(block)
+            else:
+                shm.buf[:size] = pdf_content
+            
+            batch_size = self._page_batch_size(pages_to_process)
+            logger.info(f"Extracting {pages_to_process} pages with {method} in parallel ({batch_size} pages per batch)")
+            pool = _get_process_pool()
+            batches = [
+                pool.submit(
+                    extract_shared_page_range, shm.name, size, start,
+                    min(start + batch_size, pages_to_process), method, self.max_chars_per_page
+                )
+                for start in range(0, pages_to_process, batch_size)
+            ]
+            return [page for batch in batches for page in batch.result()]
+        finally:
+            # Workers may still be attaching if a batch failed early; unlink only once all finished
+            concurrent.futures.wait(batches)
+            shm.close()
+            shm.unlink()
+    
+    def _chunk_page_texts(self, page_texts: Iterable[Tuple[int, str]],
+                          label: str = "") -> Tuple[List[TextChunk], int, int]:
+        """
+        Chunk (page_number, text) pairs as they are extracted, stopping at the 10MB limit.
+        
+        Returns:
+            Tuple of (chunks, total_characters, successful_pages)
+        """
+        emitter = _ChunkEmitter(self.chunk_size, self.chunk_overlap, self.chunk_byte_budget)
+        successful_pages = 0
+        
+        for page_num, page_text in page_texts:
+            emitter.feed(f"\\n\\n--- Page {page_num} ---\\n\\n{page_text}", page_num)
+            successful_pages += 1
+            
+            # Memory safety: prevent text from growing too large
+            if emitter.total_chars > 10 * 1024 * 1024:  # 10MB text limit
+                logger.warning(f"{label}Text extraction stopped due to size limit (10MB)")
+                emitter.feed("\\n\\n[Extraction stopped - content too large]", page_num)
+                break
+        
+        return emitter.finalize(), emitter.total_chars, successful_pages
+    
+    async def _extract_with_pdfplumber(self, pdf_content: PDFSource,
+                                 known_page_count: Optional[int] = None,
+                                 timeout: Optional[float] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
+        """Extract text using pdfplumber on the extraction thread pool so the event loop stays free."""
+        return await self._run_in_executor(
+            timeout, self._extract_with_pdfplumber_sync, pdf_content, known_page_count
+        )
+    
+    def _extract_with_pdfplumber_sync(self, pdf_content: PDFSource,
+                                known_page_count: Optional[int] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
         """Extract text using pdfplumber library with robust error handling."""
         chunks = []
         metadata = {
@@ -150,90 +526,36 @@ class PDFTextExtractor:
         }
         
         try:
-            with io.BytesIO(pdf_content) as pdf_file:
-                # Proper file handle management for stderr redirection
-                devnull_file = None
-                try:
-                    import sys
-                    import os
-                    from contextlib import redirect_stderr
-                    
-                    devnull_file = open(os.devnull, 'w')
-                    with redirect_stderr(devnull_file):
-                        with pdfplumber.open(pdf_file) as pdf:
-                            metadata["total_pages"] = len(pdf.pages)
-                            
-                            # Safety check: page limit
-                            if metadata["total_pages"] > self.max_pages:
-                                logger.warning(f"PDF has {metadata['total_pages']} pages, limiting to {self.max_pages}")
-                                pages_to_process = self.max_pages
-                            else:
-                                pages_to_process = metadata["total_pages"]
-                            
-                            all_text = ""
-                            successful_pages = 0
-                            
-                            for page_num, page in enumerate(pdf.pages[:pages_to_process], 1):
-                                try:
-                                    # More robust text extraction with memory safety
-                                    page_text = None
-                                    
-                                    # Method 1: Standard extraction
-                                    try:
-                                        page_text = page.extract_text() or ""
-                                        # Memory safety check
-                                        if len(page_text) > self.max_chars_per_page:
-                                            page_text = page_text[:self.max_chars_per_page] + "...[truncated for safety]"
-                                    except Exception:
-                                        pass
-                                    
-                                    # Method 2: Extract with different settings if first failed
-                                    if not page_text or not page_text.strip():
-                                        try:
-                                            page_text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
-                                            if len(page_text) > self.max_chars_per_page:
-                                                page_text = page_text[:self.max_chars_per_page] + "...[truncated for safety]"
-                                        except Exception:
-                                            pass
-                                    
-                                    # Method 3: Character-by-character extraction with strict limits
-                                    if not page_text or not page_text.strip():
-                                        try:
-                                            chars = page.chars
-                                            if chars and len(chars) < 5000:  # Limit character extraction to prevent memory issues
-                                                page_text = ''.join([char.get('text', '') for char in chars[:5000]])
-                                            else:
-                                                page_text = f"[Page {page_num} - content extraction failed]"
-                                        except Exception:
-                                            page_text = f"[Page {page_num} - content extraction failed]"
-                                    
-                                    if page_text and page_text.strip():
-                                        all_text += f"\\n\\n--- Page {page_num} ---\\n\\n{page_text}"
-                                        successful_pages += 1
-                                    
-                                    # Memory safety: prevent text from growing too large
-                                    if len(all_text) > 10 * 1024 * 1024:  # 10MB text limit
-                                        logger.warning("Text extraction stopped due to size limit (10MB)")
-                                        all_text += "\\n\\n[Extraction stopped - content too large]"
-                                        break
-                                        
-                                except Exception as e:
-                                    logger.warning(f"Failed to extract text from page {page_num}: {str(e)[:100]}...")
-                                    continue
-                finally:
-                    # Ensure devnull file is properly closed
-                    if devnull_file:
-                        devnull_file.close()
+            with open_source_stream(pdf_content) as pdf_file:
+                # Silence pdfplumber's noisy font warnings on stderr
+                with _redirect_stderr_shared(self._devnull):
+                    with pdfplumber.open(pdf_file) as pdf:
+                        metadata["total_pages"] = known_page_count if known_page_count is not None else len(pdf.pages)
                         
-                        logger.info(f"Successfully extracted text from {successful_pages}/{metadata['total_pages']} pages")
+                        # Safety check: page limit
+                        if metadata["total_pages"] > self.max_pages:
+                            logger.warning(f"PDF has {metadata['total_pages']} pages, limiting to {self.max_pages}")
+                            pages_to_process = self.max_pages
+                        else:
+                            pages_to_process = metadata["total_pages"]
                         
-                        if not all_text.strip():
-                            raise ValueError(f"No text content found in PDF (tried {metadata['total_pages']} pages)")
-                        
-                        # Split into chunks
-                        chunks = self._create_chunks(all_text, metadata["total_pages"])
-                        metadata["total_characters"] = len(all_text)
-                        metadata["successful_pages"] = successful_pages
+                        if pages_to_process < self.parallel_min_pages:
+                            chunks, total_chars, successful_pages = self._chunk_page_texts(iter_page_texts(
+                                pdf, "pdfplumber", 0, pages_to_process, self.max_chars_per_page
+                            ))
+                
+                # Larger PDFs are extracted on the process pool (outside the stderr redirect)
+                if pages_to_process >= self.parallel_min_pages:
+                    page_texts = self._extract_pages_parallel(pdf_content, pages_to_process, "pdfplumber")
+                    chunks, total_chars, successful_pages = self._chunk_page_texts(page_texts)
+            
+            logger.info(f"Successfully extracted text from {successful_pages}/{metadata['total_pages']} pages")
+            
+            if not chunks:
+                raise ValueError(f"No text content found in PDF (tried {metadata['total_pages']} pages)")
+            
+            metadata["total_characters"] = total_chars
+            metadata["successful_pages"] = successful_pages
                         
         except Exception as e:
             logger.error(f"pdfplumber extraction failed: {str(e)}")
@@ -241,7 +563,16 @@ class PDFTextExtractor:
                 
         return chunks, metadata
     
-    async def _extract_with_pypdf2(self, pdf_content: bytes) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    async def _extract_with_pypdf2(self, pdf_content: PDFSource,
+                                 known_page_count: Optional[int] = None,
+                                 timeout: Optional[float] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
+        """Extract text using PyPDF2 on the extraction thread pool so the event loop stays free."""
+        return await self._run_in_executor(
+            timeout, self._extract_with_pypdf2_sync, pdf_content, known_page_count
+        )
+    
+    def _extract_with_pypdf2_sync(self, pdf_content: PDFSource,
+                                known_page_count: Optional[int] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
         """Extract text using PyPDF2 library with robust error handling."""
         chunks = []
         metadata = {
@@ -251,14 +582,13 @@ class PDFTextExtractor:
         }
         
         try:
-            with io.BytesIO(pdf_content) as pdf_file:
+            with open_source_stream(pdf_content) as pdf_file:
                 # Suppress warnings from PyPDF2
-                import warnings
                 with warnings.catch_warnings():
                     warnings.simplefilter("ignore")
                     
                     pdf_reader = PyPDF2.PdfReader(pdf_file)
-                    metadata["total_pages"] = len(pdf_reader.pages)
+                    metadata["total_pages"] = known_page_count if known_page_count is not None else len(pdf_reader.pages)
                     
                     # Safety check: page limit
                     if metadata["total_pages"] > self.max_pages:
@@ -267,40 +597,23 @@ class PDFTextExtractor:
                     else:
                         pages_to_process = metadata["total_pages"]
                     
-                    all_text = ""
-                    successful_pages = 0
-                    
-                    for page_num, page in enumerate(pdf_reader.pages[:pages_to_process], 1):
-                        try:
-                            page_text = page.extract_text() or ""
-                            
-                            # Memory safety check
-                            if len(page_text) > self.max_chars_per_page:
-                                page_text = page_text[:self.max_chars_per_page] + "...[truncated for safety]"
-                            
-                            if page_text.strip():
-                                all_text += f"\\n\\n--- Page {page_num} ---\\n\\n{page_text}"
-                                successful_pages += 1
-                            
-                            # Memory safety: prevent text from growing too large
-                            if len(all_text) > 10 * 1024 * 1024:  # 10MB text limit
-                                logger.warning("PyPDF2: Text extraction stopped due to size limit (10MB)")
-                                all_text += "\\n\\n[Extraction stopped - content too large]"
-                                break
-                                
-                        except Exception as e:
-                            logger.warning(f"Failed to extract text from page {page_num}: {str(e)[:100]}...")
-                            continue
-                    
-                    logger.info(f"PyPDF2: Successfully extracted text from {successful_pages}/{metadata['total_pages']} pages")
-                    
-                    if not all_text.strip():
-                        raise ValueError(f"No text content found in PDF (tried {metadata['total_pages']} pages)")
-                    
-                    # Split into chunks
-                    chunks = self._create_chunks(all_text, metadata["total_pages"])
-                    metadata["total_characters"] = len(all_text)
-                    metadata["successful_pages"] = successful_pages
+                    if pages_to_process < self.parallel_min_pages:
+                        chunks, total_chars, successful_pages = self._chunk_page_texts(iter_page_texts(
+                            pdf_reader, "pypdf2", 0, pages_to_process, self.max_chars_per_page
+                        ), label="PyPDF2: ")
+                
+                # Larger PDFs are extracted on the process pool
+                if pages_to_process >= self.parallel_min_pages:
+                    page_texts = self._extract_pages_parallel(pdf_content, pages_to_process, "pypdf2")
+                    chunks, total_chars, successful_pages = self._chunk_page_texts(page_texts, label="PyPDF2: ")
+                
+                logger.info(f"PyPDF2: Successfully extracted text from {successful_pages}/{metadata['total_pages']} pages")
+                
+                if not chunks:
+                    raise ValueError(f"No text content found in PDF (tried {metadata['total_pages']} pages)")
+                
+                metadata["total_characters"] = total_chars
+                metadata["successful_pages"] = successful_pages
                     
         except Exception as e:
             logger.error(f"PyPDF2 extraction failed: {str(e)}")
@@ -308,7 +621,7 @@ class PDFTextExtractor:
             
         return chunks, metadata
     
-    def _create_chunks(self, text: str, total_pages: int) -> List[Dict[str, Any]]:
+    def _create_chunks(self, text: str, total_pages: int) -> List[TextChunk]:
         """Split text into overlapping chunks with memory safety."""
         chunks = []
         text = text.strip()
@@ -321,57 +634,59 @@ class PDFTextExtractor:
         
         if len(text) <= self.chunk_size:
             # If text is smaller than chunk size, return as single chunk
-            chunks.append({
-                "content": text,
-                "chunk_index": 0,
-                "page_number": 1,  # Approximate
-                "chunk_size": len(text),
-                "start_char": 0,
-                "end_char": len(text)
-            })
+            chunks.append(TextChunk(
+                content=text,
+                chunk_index=0,
+                page_number=1,  # Approximate
+                chunk_size=len(text),
+                start_char=0,
+                end_char=len(text)
+            ))
             return chunks
         
         start = 0
         chunk_index = 0
-        max_chunks = 100  # Reasonable limit for a small PDF
+        emitted_chars = 0
+        # Enough chunks to cover the whole text even when boundaries fall well short of
+        # chunk_size; the byte budget is the real memory guard
+        max_chunks = max(100, len(text) // max(1, (self.chunk_size - self.chunk_overlap) // 2) + 16)
         
-        while start < len(text) and chunk_index < max_chunks:
+        while start < len(text) and chunk_index < max_chunks and emitted_chars < self.chunk_byte_budget:
             # Calculate end position
             end = start + self.chunk_size
             
             # If we're not at the end, try to break at a sentence or word boundary
             if end < len(text):
-                # Look for sentence ending
-                sentence_end = text.rfind('.', start, end)
-                if sentence_end > start:
-                    end = sentence_end + 1
-                else:
-                    # Look for word boundary
-                    word_end = text.rfind(' ', start, end)
-                    if word_end > start:
-                        end = word_end
+                # Look for sentence ending, then word boundary, in a single scan
+                boundary = _BOUNDARY_RE.match(text, start, end)
+                if boundary:
+                    end = boundary.end()
             
             chunk_content = text[start:end].strip()
             if chunk_content:
                 # Estimate page number based on position
                 estimated_page = min(int((start / len(text)) * total_pages) + 1, total_pages)
                 
-                chunks.append({
-                    "content": chunk_content,
-                    "chunk_index": chunk_index,
-                    "page_number": estimated_page,
-                    "chunk_size": len(chunk_content),
-                    "start_char": start,
-                    "end_char": end
-                })
+                chunks.append(TextChunk(
+                    content=chunk_content,
+                    chunk_index=chunk_index,
+                    page_number=estimated_page,
+                    chunk_size=len(chunk_content),
+                    start_char=start,
+                    end_char=end
+                ))
                 chunk_index += 1
+                emitted_chars += len(chunk_content)
             
-            # Move start position (with overlap)
-            start = end - self.chunk_overlap
+            # Move start position (with overlap); when the chunk was shorter than the overlap,
+            # continue from its end so an early boundary isn't re-emitted char by char
+            start = end if end - self.chunk_overlap <= start else end - self.chunk_overlap
             if start >= len(text):
                 break
         
-        if chunk_index >= max_chunks:
+        if emitted_chars >= self.chunk_byte_budget:
+            logger.warning(f"Chunk budget reached ({self.chunk_byte_budget // 1024 // 1024}MB), text may be truncated")
+        elif chunk_index >= max_chunks:
             logger.warning(f"Chunk limit reached ({max_chunks}), text may be truncated")
         
         return chunks
@@ -381,7 +696,8 @@ class PDFTextExtractor:
         self.chunk_size = max(100, chunk_size)  # Minimum chunk size
         self.chunk_overlap = min(chunk_overlap, chunk_size // 2)  # Overlap can't exceed half chunk size
     
-    async def _extract_basic(self, pdf_content: bytes) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    async def _extract_basic(self, pdf_content: PDFSource,
+                             known_page_count: Optional[int] = None) -> Tuple[List[TextChunk], Dict[str, Any]]:
         """Basic fallback extraction method for problematic PDFs."""
         chunks = []
         metadata = {
@@ -413,21 +729,10 @@ class PDFTextExtractor:
             content from this document.
             """
             
-            # Try to get some basic info about the PDF
-            try:
-                with io.BytesIO(pdf_content) as pdf_file:
-                    try:
-                        # Try PyPDF2 just to get page count
-                        import PyPDF2
-                        pdf_reader = PyPDF2.PdfReader(pdf_file)
-                        page_count = len(pdf_reader.pages)
-                        if page_count > 0:
-                            metadata["total_pages"] = page_count
-                            fallback_text += f"\n\nThe PDF appears to have {page_count} pages."
-                    except:
-                        pass  # Ignore errors here
-            except:
-                pass  # Ignore any errors
+            # Reuse the page count probed in extract_text instead of re-parsing the file
+            metadata["total_pages"] = known_page_count or 1
+            if known_page_count:
+                fallback_text += f"\n\nThe PDF appears to have {known_page_count} pages."
             
             chunks = self._create_chunks(fallback_text.strip(), metadata["total_pages"])
             metadata["total_characters"] = len(fallback_text)
@@ -438,14 +743,14 @@ class PDFTextExtractor:
         except Exception as e:
             logger.error(f"Even basic extraction failed: {str(e)}")
             # Don't raise, just return minimal chunks
-            chunks = [{
-                "content": "PDF extraction failed completely. This is an emergency fallback.",
-                "chunk_index": 0,
-                "page_number": 1,
-                "chunk_size": 57,
-                "start_char": 0,
-                "end_char": 57
-            }]
+            chunks = [TextChunk(
+                content="PDF extraction failed completely. This is an emergency fallback.",
+                chunk_index=0,
+                page_number=1,
+                chunk_size=57,
+                start_char=0,
+                end_char=57
+            )]
             metadata["extraction_note"] = f"Emergency fallback: {str(e)}"
             
         return chunks, metadata
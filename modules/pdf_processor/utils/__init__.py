@@ -4,4 +4,27 @@ PDF Processor Utils
 Utility functions for PDF processing.
 """
 
-__all__ = []
+from .pdf_source import (
+    PDFSource,
+    is_file_source,
+    get_source_size,
+    read_source_header,
+    open_source_stream,
+    hash_source,
+    fingerprint_source,
+    XXHASH_AVAILABLE
+)
+from .token_counter import NUMBA_AVAILABLE, count_tokens
+
+__all__ = [
+    "PDFSource",
+    "is_file_source",
+    "get_source_size",
+    "read_source_header",
+    "open_source_stream",
+    "hash_source",
+    "fingerprint_source",
+    "XXHASH_AVAILABLE",
+    "NUMBA_AVAILABLE",
+    "count_tokens"
+]
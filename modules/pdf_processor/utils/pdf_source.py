@@ -0,0 +1,124 @@
+"""
+PDF Source Helpers
+
+Helpers for working with PDF content passed as bytes, memoryview or a binary file object
+without copying it into a new buffer. Content fingerprints use xxhash when it is installed
+and fall back to BLAKE2b otherwise.
+"""
+
+import hashlib
+import io
+import os
+import threading
+from typing import IO, Union
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+PDFSource = Union[bytes, memoryview, IO[bytes]]
+
+# Serializes every seek+read on shared file sources; readers go through _SourceView
+_source_lock = threading.Lock()
+
+
+def is_file_source(source: PDFSource) -> bool:
+    """Check whether the source is a readable binary file object."""
+    return hasattr(source, "read")
+
+
+def get_source_size(source: PDFSource) -> int:
+    """Return the size of the PDF source in bytes."""
+    if is_file_source(source):
+        with _source_lock:
+            position = source.tell()
+            size = source.seek(0, os.SEEK_END)
+            source.seek(position)
+        return size
+    # nbytes, not len(): a memoryview with a wider format counts elements, not bytes
+    return memoryview(source).nbytes if source is not None else 0
+
+
+def read_source_header(source: PDFSource, length: int = 4) -> bytes:
+    """Read the first bytes of the source (used for the '%PDF' signature check)."""
+    if is_file_source(source):
+        with open_source_stream(source) as stream:
+            return stream.read(length)
+    return bytes(memoryview(source).cast("B")[:length])
+
+
+class _SourceView(io.RawIOBase):
+    """
+    Independent read-only cursor over a shared seekable file object.
+
+    Every read seeks the underlying file to this view's own position under a lock, so
+    several readers (e.g. an extraction tier that timed out but is still running, and
+    the next tier) can use the same upload without disturbing each other.
+    """
+
+    def __init__(self, source: IO[bytes]):
+        self._source = source
+        self._position = 0
+        self._size = get_source_size(source)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        if whence == os.SEEK_CUR:
+            offset += self._position
+        elif whence == os.SEEK_END:
+            offset += self._size
+        if offset < 0:
+            raise ValueError(f"negative seek position {offset}")
+        self._position = offset
+        return offset
+
+    def readinto(self, buffer) -> int:
+        with _source_lock:
+            self._source.seek(self._position)
+            data = self._source.read(len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
+def open_source_stream(source: PDFSource):
+    """
+    Return a context manager yielding a seekable binary stream positioned at the start.
+
+    File objects get their own buffered cursor (the file itself stays open for the
+    caller), so concurrent readers never share a stream position. Bytes are wrapped in
+    a BytesIO that shares the underlying buffer.
+    """
+    if is_file_source(source):
+        return io.BufferedReader(_SourceView(source), buffer_size=1 << 16)
+    return io.BytesIO(source)
+
+
+def hash_source(source: PDFSource) -> str:
+    """Return the SHA-256 hex digest of the PDF source content."""
+    if is_file_source(source):
+        with open_source_stream(source) as stream:
+            return hashlib.file_digest(stream, "sha256").hexdigest()
+    return hashlib.sha256(source).hexdigest()
+
+
+def fingerprint_source(source: PDFSource) -> bytes:
+    """Return a fast 128-bit content digest for in-memory cache keys (xxh3_128 or BLAKE2b)."""
+    hasher = xxhash.xxh3_128() if XXHASH_AVAILABLE else hashlib.blake2b(digest_size=16)
+    if is_file_source(source):
+        with open_source_stream(source) as stream:
+            for block in iter(lambda: stream.read(1 << 20), b""):
+                hasher.update(block)
+    else:
+        hasher.update(source)
+    return hasher.digest()
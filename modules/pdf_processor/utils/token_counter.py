@@ -0,0 +1,62 @@
+"""
+Token Counter
+
+Approximate whitespace token counts for chunk metadata, computed for a whole document
+in one pass. Uses a Numba-compiled kernel for ASCII text when numba is installed and
+``str.split`` otherwise, so counts never depend on whether numba is available.
+"""
+
+from typing import List
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, cache=True)
+    def _token_counts(buf, offsets):
+        """Count whitespace-separated tokens in each [offsets[i], offsets[i+1]) slice of buf."""
+        out = np.empty(len(offsets) - 1, np.int32)
+        for i in prange(len(offsets) - 1):
+            count = 0
+            in_token = False
+            for j in range(offsets[i], offsets[i + 1]):
+                b = buf[j]
+                # Every ASCII code point str.isspace() accepts: \t-\r, \x1c-\x1f and space
+                if b == 0x20 or (b >= 0x09 and b <= 0x0D) or (b >= 0x1C and b <= 0x1F):
+                    in_token = False
+                elif not in_token:
+                    in_token = True
+                    count += 1
+            out[i] = count
+        return out
+
+
+def count_tokens(contents: List[str]) -> List[int]:
+    """Return the approximate token count (whitespace-separated words) for each text."""
+    if not NUMBA_AVAILABLE or not contents:
+        return [len(content.split()) if content else 0 for content in contents]
+
+    # The kernel only knows ASCII whitespace; text with NBSP, EM SPACE etc. uses str.split()
+    counts = [0] * len(contents)
+    ascii_indexes = []
+    for i, content in enumerate(contents):
+        if content and content.isascii():
+            ascii_indexes.append(i)
+        elif content:
+            counts[i] = len(content.split())
+    if not ascii_indexes:
+        return counts
+
+    encoded = [contents[i].encode("ascii") for i in ascii_indexes]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    buf = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    for i, count in zip(ascii_indexes, _token_counts(buf, offsets).tolist()):
+        counts[i] = count
+    return counts
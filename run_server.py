@@ -17,12 +17,26 @@ if __name__ == "__main__":
     print("⚠️  Press Ctrl+C to stop the server")
     print("-" * 60)
     
+    # DEV=1 enables auto-reload (single process). Otherwise run WEB_CONCURRENCY workers;
+    # each worker loads its own embedding model, so scale it to the available memory.
+    # On Linux production hosts the equivalent gunicorn setup is:
+    #   gunicorn api.main:app -k uvicorn.workers.UvicornWorker -w $WEB_CONCURRENCY -b 0.0.0.0:8000
+    dev_mode = os.getenv("DEV") == "1"
+    workers = 1 if dev_mode else int(os.getenv("WEB_CONCURRENCY", "1"))
+    
     try:
         uvicorn.run(
             "api.main:app",
             host="0.0.0.0",
             port=8000,
-            reload=True,
+            reload=dev_mode,
+            workers=workers,
+            # "auto" picks uvloop and httptools (installed with uvicorn[standard]) and
+            # falls back to asyncio/h11 where they aren't available, e.g. uvloop on Windows
+            loop=os.getenv("UVICORN_LOOP", "auto"),
+            http=os.getenv("UVICORN_HTTP", "auto"),
+            limit_concurrency=1000,
+            timeout_keep_alive=30,
             log_level="info"
         )
     except KeyboardInterrupt:
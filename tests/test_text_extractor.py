@@ -0,0 +1,49 @@
+import sys
+import os
+
+# Add project root to python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from modules.pdf_processor.services.text_extractor import PDFTextExtractor, _ChunkEmitter
+
+
+def _short_leading_sentence_text() -> str:
+    """A page starting with a sentence shorter than the chunk overlap, then no more periods."""
+    return "Table 1. " + " ".join(["word"] * 800)
+
+
+def test_create_chunks_does_not_repeat_short_leading_sentence():
+    extractor = PDFTextExtractor()
+    text = _short_leading_sentence_text()
+
+    chunks = extractor._create_chunks(text, total_pages=1)
+
+    starts = [chunk.start_char for chunk in chunks]
+    assert len(set(starts)) == len(starts)
+    assert chunks[0].content == "Table 1."
+    assert chunks[1].start_char == chunks[0].end_char
+    assert len(chunks) <= len(text) // (extractor.chunk_size - extractor.chunk_overlap) + 2
+
+
+def test_chunk_emitter_matches_create_chunks_for_short_leading_sentence():
+    extractor = PDFTextExtractor()
+    text = _short_leading_sentence_text()
+
+    emitter = _ChunkEmitter(extractor.chunk_size, extractor.chunk_overlap)
+    emitter.feed(text, 1)
+    streamed = emitter.finalize()
+
+    expected = extractor._create_chunks(text, total_pages=1)
+    assert [(c.start_char, c.end_char, c.content) for c in streamed] == \
+        [(c.start_char, c.end_char, c.content) for c in expected]
+
+
+def test_result_cache_key_changes_with_chunk_parameters():
+    extractor = PDFTextExtractor()
+    digest = b"\x00" * 32
+    before = extractor._result_cache_key(digest)
+
+    extractor.set_chunk_parameters(extractor.chunk_size // 2, extractor.chunk_overlap // 2)
+
+    assert extractor._result_cache_key(digest) != before
@@ -0,0 +1,23 @@
+import sys
+import os
+
+# Add project root to python path
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, project_root)
+
+from modules.pdf_processor.utils.token_counter import count_tokens
+
+
+def test_count_tokens_matches_str_split_for_unicode_and_ascii_whitespace():
+    contents = [
+        "plain ascii words here",
+        "non breaking space",  # NBSP
+        "em space and　ideographic",  # EM SPACE, IDEOGRAPHIC SPACE
+        "line separator",
+        "unit\x1fseparator\x1crecord",  # ASCII separators str.isspace() accepts
+        "  leading and trailing\t\n",
+        "",
+        "café naïve",
+    ]
+
+    assert count_tokens(contents) == [len(content.split()) for content in contents]
@@ -0,0 +1,125 @@
+"""
+PDF page extraction worker
+
+Page-range text extraction shared by PDFTextExtractor and its process pool. This module
+lives outside the modules.pdf_processor package on purpose: pool workers import it to
+unpickle their task, and importing anything under modules.pdf_processor would first run
+the package __init__ (torch, sentence_transformers, supabase, numba) in every worker.
+Keep its imports limited to the PDF libraries.
+"""
+
+import io
+import sys
+import itertools
+import logging
+import warnings
+from multiprocessing import shared_memory
+from typing import List, Tuple, Iterator
+import PyPDF2
+import pdfplumber
+
+logger = logging.getLogger(__name__)
+
+
+def cap_text(text: str, max_chars: int) -> str:
+    """Truncate text to max_chars for memory safety; returns the same object when it already fits."""
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + "...[truncated for safety]"
+
+
+def extract_pdfplumber_page(page, page_num: int, max_chars_per_page: int) -> str:
+    """Extract text from a single pdfplumber page, trying progressively simpler methods."""
+    page_text = None
+    have_text = False
+    
+    # Method 1: Standard extraction
+    try:
+        page_text = page.extract_text() or ""
+        have_text = bool(page_text) and not page_text.isspace()
+    except Exception:
+        pass
+    
+    # Method 2: Extract with different settings if first failed
+    if not have_text:
+        try:
+            page_text = page.extract_text(x_tolerance=2, y_tolerance=2) or ""
+            have_text = bool(page_text) and not page_text.isspace()
+        except Exception:
+            pass
+    
+    # Method 3: Character-by-character extraction with strict limits
+    if not have_text:
+        try:
+            chars = page.chars
+            if chars and len(chars) < 5000:  # Limit character extraction to prevent memory issues
+                page_text = ''.join(char['text'] for char in itertools.islice(chars, 5000) if 'text' in char)
+            else:
+                page_text = f"[Page {page_num} - content extraction failed]"
+        except Exception:
+            page_text = f"[Page {page_num} - content extraction failed]"
+    
+    # Memory safety check
+    return cap_text(page_text, max_chars_per_page)
+
+
+def iter_page_texts(doc, method: str, start: int, end: int, max_chars_per_page: int) -> Iterator[Tuple[int, str]]:
+    """Yield (page_number, text) for pages [start, end) of an open pdfplumber PDF or PyPDF2 reader that produced text."""
+    for page_index in range(start, end):
+        page_num = page_index + 1
+        try:
+            page = doc.pages[page_index]
+            if method == "pdfplumber":
+                try:
+                    page_text = extract_pdfplumber_page(page, page_num, max_chars_per_page)
+                finally:
+                    # Drop the page's cached chars/layout objects now; otherwise every page's
+                    # cache stays alive until the whole document is closed
+                    page.close()
+            else:
+                # Memory safety check
+                page_text = cap_text(page.extract_text() or "", max_chars_per_page)
+        except Exception as e:
+            logger.warning(f"Failed to extract text from page {page_num}: {str(e)[:100]}...")
+            continue
+        
+        if page_text and page_text.strip():
+            yield page_num, page_text
+
+
+def extract_page_range(pdf_bytes: bytes, start: int, end: int, method: str,
+                        max_chars_per_page: int) -> List[Tuple[int, str]]:
+    """
+    Extract text from pages [start, end) with pdfplumber or PyPDF2.
+    
+    Runs in the parent for sequential extraction and in pool workers. Returns (page_number, text) pairs
+    for pages that produced text, in page order.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        if method == "pdfplumber":
+            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+                end = min(end, len(pdf.pages))
+                return list(iter_page_texts(pdf, method, start, end, max_chars_per_page))
+        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+        end = min(end, len(pdf_reader.pages))
+        return list(iter_page_texts(pdf_reader, method, start, end, max_chars_per_page))
+
+
+def extract_shared_page_range(shm_name: str, size: int, start: int, end: int, method: str,
+                               max_chars_per_page: int) -> List[Tuple[int, str]]:
+    """
+    Worker entry point: extract pages [start, end) from PDF bytes published in shared memory.
+    
+    Only the segment name crosses the process boundary; the worker copies the bytes out of
+    the mapped segment locally instead of receiving a pickled copy of the whole PDF.
+    """
+    # Python 3.13+ can attach without registering the segment with the resource tracker,
+    # which would otherwise try to clean up a segment the parent owns
+    kwargs = {"track": False} if sys.version_info >= (3, 13) else {}
+    shm = shared_memory.SharedMemory(name=shm_name, **kwargs)
+    try:
+        pdf_bytes = bytes(shm.buf[:size])
+    finally:
+        shm.close()
+    return extract_page_range(pdf_bytes, start, end, method, max_chars_per_page)
@@ -4,14 +4,29 @@ Performance Monitoring and Optimization Utilities for PDF Processing
 This module provides tools to monitor and optimize PDF processing performance.
 """
 
+import os
 import time
 import psutil
 import logging
-from typing import Dict, Any, Optional, List
-from contextlib import contextmanager
+import numpy as np
+from typing import Dict, Any, Optional, List, Tuple
+from contextlib import contextmanager, nullcontext
 
 logger = logging.getLogger(__name__)
 
+_BYTES_TO_MB = 1 / (1024 * 1024)
+_BYTES_TO_GB = 1 / (1024 * 1024 * 1024)
+
+# System resources are dashboard data; sample them at most this often
+_RESOURCE_CACHE_TTL = 5.0
+_resource_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+
+# Set PDF_PROFILING=0 to swap in a no-op profiler that never touches psutil
+PROFILING_ENABLED = os.getenv("PDF_PROFILING", "1") != "0"
+
+# Prime psutil's CPU sampler so later non-blocking cpu_percent() calls have a baseline
+psutil.cpu_percent(interval=None)
+
 class PDFProcessingProfiler:
     """Performance profiler for PDF processing operations.
 
@@ -48,9 +63,9 @@ class PDFProcessingProfiler:
     # ---------------------------------------------------------------------
     def start_profiling(self) -> None:
         """Start performance profiling for the whole operation."""
-        self.start_time = time.time()
+        self.start_time = time.perf_counter()
         self.metrics = {
-            "start_memory": self._process.memory_info().rss / 1024 / 1024,  # MB
+            "start_memory": self._process.memory_info().rss * _BYTES_TO_MB,  # MB
             "start_cpu": psutil.cpu_percent(),
             "phases": {}
         }
@@ -61,10 +76,10 @@ class PDFProcessingProfiler:
         if self.start_time is None:
             logger.warning("stop_profiling called without start_profiling")
             return
-        total_time = time.time() - self.start_time
+        total_time = time.perf_counter() - self.start_time
         self.metrics.update({
             "total_time_sec": total_time,
-            "end_memory": self._process.memory_info().rss / 1024 / 1024,
+            "end_memory": self._process.memory_info().rss * _BYTES_TO_MB,
             "end_cpu": psutil.cpu_percent()
         })
     
@@ -74,12 +89,12 @@ class PDFProcessingProfiler:
     @contextmanager
     def profile_phase(self, name: str):
         """Record timing and memory/CPU usage for a named phase."""
-        start = time.time()
-        start_mem = self._process.memory_info().rss / 1024 / 1024
+        start = time.perf_counter()
+        start_mem = self._process.memory_info().rss * _BYTES_TO_MB
         start_cpu = psutil.cpu_percent()
         yield  # execute the wrapped block
-        end = time.time()
-        end_mem = self._process.memory_info().rss / 1024 / 1024
+        end = time.perf_counter()
+        end_mem = self._process.memory_info().rss * _BYTES_TO_MB
         end_cpu = psutil.cpu_percent()
         self.metrics["phases"][name] = {
             "elapsed_sec": end - start,
@@ -88,13 +103,15 @@ class PDFProcessingProfiler:
         }
         
     def log_phase(self, phase_name: str, additional_info: Optional[Dict[str, Any]] = None):
-        """Log a processing phase with timing and resource usage."""
+        """Log a processing phase with timing and resource usage (no-op unless INFO is enabled)."""
+        if not logger.isEnabledFor(logging.INFO):
+            return
         if not self.start_time:
             logger.warning("Profiling not started")
             return
             
-        current_time = time.time()
-        current_memory = self._process.memory_info().rss / 1024 / 1024  # MB
+        current_time = time.perf_counter()
+        current_memory = self._process.memory_info().rss * _BYTES_TO_MB  # MB
         
         phase_data = {
             "elapsed_time": current_time - self.start_time,
@@ -115,8 +132,8 @@ class PDFProcessingProfiler:
         if not self.start_time:
             return {}
             
-        total_time = time.time() - self.start_time
-        final_memory = self._process.memory_info().rss / 1024 / 1024
+        total_time = time.perf_counter() - self.start_time
+        final_memory = self._process.memory_info().rss * _BYTES_TO_MB
         
         return {
             "total_time": total_time,
@@ -128,8 +145,8 @@ class PDFProcessingProfiler:
         
     def _calculate_efficiency_score(self) -> float:
         """Calculate an efficiency score based on time and memory usage."""
-        total_time = time.time() - self.start_time if self.start_time else 0
-        memory_usage = self._process.memory_info().rss / 1024 / 1024
+        total_time = time.perf_counter() - self.start_time if self.start_time else 0
+        memory_usage = self._process.memory_info().rss * _BYTES_TO_MB
         
         # Normalize and combine metrics (0-100 scale)
         time_score = max(0, 100 - (total_time * 2))  # Penalty for long processing
@@ -137,6 +154,38 @@ class PDFProcessingProfiler:
         
         return (time_score + memory_score) / 2
 
+class NullProfiler:
+    """Drop-in profiler with no-op methods, used when profiling is disabled."""
+    
+    def __init__(self):
+        self.start_time: Optional[float] = None
+        self.metrics: Dict[str, Any] = {}
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        return False
+    
+    def start_profiling(self) -> None:
+        pass
+    
+    def stop_profiling(self) -> None:
+        pass
+    
+    def profile_phase(self, name: str):
+        return nullcontext()
+    
+    def log_phase(self, phase_name: str, additional_info: Optional[Dict[str, Any]] = None):
+        pass
+    
+    def get_summary(self) -> Dict[str, Any]:
+        return {}
+
+def get_profiler():
+    """Return a new profiler, or a ``NullProfiler`` when PDF_PROFILING=0."""
+    return PDFProcessingProfiler() if PROFILING_ENABLED else NullProfiler()
+
 # ---------------------------------------------------------------------
 # Convenience decorator using a shared profiler instance
 # ---------------------------------------------------------------------
@@ -152,58 +201,76 @@ def profile(func):
 @contextmanager
 def performance_monitor(operation_name: str):
     """Context manager for monitoring performance of operations."""
-    profiler = PDFProcessingProfiler()
+    profiler = get_profiler()
     profiler.start_profiling()
     
     try:
         yield profiler
     finally:
-        summary = profiler.get_summary()
-        logger.info(f"🏁 Operation '{operation_name}' completed in {summary.get('total_time', 0):.1f}s")
-        logger.info(f"📈 Memory usage: {summary.get('memory_peak', 0):.1f}MB "
-                    f"(+{summary.get('memory_increase', 0):.1f}MB)")
-        logger.info(f"⭐ Efficiency score: {summary.get('efficiency_score', 0):.1f}/100")
+        if logger.isEnabledFor(logging.INFO):
+            _log_operation_summary(operation_name, profiler.get_summary())
+
+def _log_operation_summary(operation_name: str, summary: Dict[str, Any]):
+    """Log the timing, memory and efficiency summary of a monitored operation."""
+    logger.info(f"🏁 Operation '{operation_name}' completed in {summary.get('total_time', 0):.1f}s")
+    logger.info(f"📈 Memory usage: {summary.get('memory_peak', 0):.1f}MB "
+                f"(+{summary.get('memory_increase', 0):.1f}MB)")
+    logger.info(f"⭐ Efficiency score: {summary.get('efficiency_score', 0):.1f}/100")
+
+def optimize_chunk_sizes(text_lengths: np.ndarray, target_chunks: int = 50) -> np.ndarray:
+    """Calculate optimal chunk sizes for a batch of documents in one vectorised pass."""
+    text_lengths = np.asarray(text_lengths, dtype=np.int64)
+    # Large documents - size by target chunk count, clamped between 800-2000
+    large = np.clip(text_lengths // target_chunks, 800, 2000)
+    return np.where(text_lengths < 1000, 500,  # Small documents
+                    np.where(text_lengths < 10000, 1000, large))  # Medium / large documents
+
+def estimate_processing_times(sizes_mb: np.ndarray, pages: np.ndarray) -> np.ndarray:
+    """Estimate processing times for a batch of documents from file sizes and page counts."""
+    sizes_mb = np.asarray(sizes_mb, dtype=np.float64)
+    pages = np.asarray(pages, dtype=np.float64)
+    base_time = 2.0  # Base processing time in seconds
+    size_factor = sizes_mb * 0.5  # 0.5 seconds per MB
+    page_factor = pages * 0.1  # 0.1 seconds per page
+    embedding_factor = pages * 2  # Embedding generation time
+    
+    return base_time + size_factor + page_factor + embedding_factor
 
 def optimize_chunk_size(text_length: int, target_chunks: int = 50) -> int:
     """Calculate optimal chunk size based on text length and target number of chunks."""
-    if text_length < 1000:
-        return 500  # Small documents
-    elif text_length < 10000:
-        return 1000  # Medium documents
-    else:
-        # Large documents - calculate based on target chunks
-        optimal_size = text_length // target_chunks
-        return min(max(optimal_size, 800), 2000)  # Clamp between 800-2000
+    return int(optimize_chunk_sizes(np.array([text_length]), target_chunks)[0])
 
 def estimate_processing_time(file_size_mb: float, num_pages: int) -> float:
     """Estimate processing time based on file size and page count."""
-    base_time = 2.0  # Base processing time in seconds
-    size_factor = file_size_mb * 0.5  # 0.5 seconds per MB
-    page_factor = num_pages * 0.1  # 0.1 seconds per page
-    embedding_factor = (num_pages * 2)  # Embedding generation time
-    
-    return base_time + size_factor + page_factor + embedding_factor
+    return float(estimate_processing_times(np.array([file_size_mb]), np.array([num_pages]))[0])
 
 def check_system_resources() -> Dict[str, Any]:
-    """Check available system resources."""
-    return {
-        "cpu_percent": psutil.cpu_percent(interval=1),
-        "memory_percent": psutil.virtual_memory().percent,
-        "available_memory_gb": psutil.virtual_memory().available / 1024 / 1024 / 1024,
-        "disk_space_gb": psutil.disk_usage('/').free / 1024 / 1024 / 1024,
-        "recommendations": _get_performance_recommendations()
+    """Check available system resources (sampled without blocking, cached for a few seconds)."""
+    global _resource_cache
+    now = time.monotonic()
+    if _resource_cache is not None and now - _resource_cache[0] < _RESOURCE_CACHE_TTL:
+        return dict(_resource_cache[1])
+    
+    cpu = psutil.cpu_percent(interval=None)
+    memory = psutil.virtual_memory()
+    resources = {
+        "cpu_percent": cpu,
+        "memory_percent": memory.percent,
+        "available_memory_gb": memory.available * _BYTES_TO_GB,
+        "disk_space_gb": psutil.disk_usage('/').free * _BYTES_TO_GB,
+        "recommendations": _get_performance_recommendations(memory.percent, cpu)
     }
+    _resource_cache = (now, resources)
+    return dict(resources)
 
-def _get_performance_recommendations() -> List[str]:
+def _get_performance_recommendations(memory_percent: float, cpu_percent: float) -> List[str]:
     """Get performance recommendations based on current system state."""
     recommendations = []
     
-    memory = psutil.virtual_memory()
-    if memory.percent > 85:
+    if memory_percent > 85:
         recommendations.append("High memory usage detected. Consider processing smaller PDFs or restarting the service.")
     
-    cpu = psutil.cpu_percent(interval=1)
-    if cpu > 90:
+    if cpu_percent > 90:
         recommendations.append("High CPU usage detected. Consider reducing parallel processing.")
     
     if len(recommendations) == 0: